@@ -0,0 +1,46 @@
+import os
+import asyncio
+import threading
+
+# One asyncio event loop per process, on its own thread, for awaitable LLM
+# calls. Coroutines submitted from job threads share it, so in-flight calls
+# cost a task each instead of a thread each.
+
+# Max LLM calls awaiting a response at once on the loop
+LLM_ASYNC_MAX_CALLS = int(os.getenv("LLM_ASYNC_MAX_CALLS", "64"))
+
+_loop = None
+_lock = threading.Lock()
+_calls = asyncio.Semaphore(LLM_ASYNC_MAX_CALLS)
+_in_flight = 0
+
+
+def get_loop():
+    global _loop
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="aio-loop", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def submit(coro):
+    # Runs coro on the loop and returns a concurrent.futures.Future, so callers
+    # can mix it with executor futures. contextvars (the metrics trace) are
+    # copied from the calling thread.
+    return asyncio.run_coroutine_threadsafe(_limited(coro), get_loop())
+
+
+async def _limited(coro):
+    global _in_flight
+    async with _calls:
+        _in_flight += 1
+        try:
+            return await coro
+        finally:
+            _in_flight -= 1
+
+
+def in_flight():
+    return _in_flight
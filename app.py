@@ -1,159 +1,1206 @@
 import os
+import re
+import io
+import csv
 import json
 import time
-from flask import Flask, request, render_template
-import fitz  # PyMuPDF
-import openai
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import Flask, request, render_template, redirect, url_for, jsonify, abort, Response
 from dotenv import load_dotenv
 
+# Load .env before the local modules below read their settings from the environment
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+
+import jobs
+import results
+import documents
+from cache import DiskCache, content_hash
+from pdf import spool_upload, extract_pages, text_cache, layout_cache, peak_rss_mb, RSSSampler
+from retrieval import SubmittalIndex
+from specparse import parse_spec
+from rules import SubmittalFacts
+from similarity import group_requirements
+from tokens import count_tokens, split_text
+from llm import get_client
+from parsing import parse_stream, aparse_stream, COMPARE_ITEM_SCHEMA, REQUIREMENT_SCHEMA, ARTICLE_REQUIREMENT_SCHEMA
+from summary import build_summary, is_failure
+import metrics
+import aio
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB limit
 
+# Max LLM calls in flight at once, shared by all jobs in this process
+CHECK_MAX_WORKERS = int(os.getenv("CHECK_MAX_WORKERS", "4"))
+llm_executor = ThreadPoolExecutor(max_workers=CHECK_MAX_WORKERS)
+# With LLM_ASYNC=1 comparison calls are awaited on one event loop per process
+# (aio.py) instead of each holding an llm_executor thread; LLM_ASYNC_MAX_CALLS
+# then bounds how many are in flight
+LLM_ASYNC = os.getenv("LLM_ASYNC", "0") == "1"
+# Submittals of a batch job prepared at once (PDF extraction and retrieval);
+# their comparison calls still go through llm_executor
+BATCH_SUBMITTAL_WORKERS = int(os.getenv("BATCH_SUBMITTAL_WORKERS", "4"))
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_SUBMITTAL_WORKERS)
+
+# Event streams are closed after this long; EventSource reconnects with
+# Last-Event-ID, so one stream never holds a worker for a whole job
+SSE_MAX_SECONDS = int(os.getenv("SSE_MAX_SECONDS", "30"))
+
+# Comparison batches are sized by estimated tokens instead of a fixed count
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "1500"))
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "12"))
+# Optional safety cap on requirements checked per job (0 = check all)
+MAX_REQUIREMENTS = int(os.getenv("MAX_REQUIREMENTS", "0"))
+
+# Parsed requirement lists, keyed by spec text hash plus everything that shapes
+# the extraction output. Bump EXTRACT_PROMPT_VERSION whenever the prompt changes.
+EXTRACT_MODEL = "gpt-4o"
+EXTRACT_PROMPT_VERSION = 3
+EXTRACT_TEMPERATURE = 0
+# Specs are split into overlapping sections of at most this many tokens and
+# each section is sent as its own extraction call
+EXTRACT_SECTION_TOKENS = int(os.getenv("EXTRACT_SECTION_TOKENS", "6000"))
+EXTRACT_SECTION_OVERLAP = int(os.getenv("EXTRACT_SECTION_OVERLAP", "300"))
+requirements_cache = DiskCache("requirements", int(os.getenv("REQUIREMENTS_CACHE_MAX_MB", "50")) * 1024 * 1024)
+
+# Per-requirement compliance results, keyed by requirement text plus a hash of
+# the submittal excerpt retrieved for it
+COMPARE_MODEL = "gpt-4o"
+COMPARE_PROMPT_VERSION = 2
+# Follow-up calls for requirements a comparison response left out or garbled
+COMPARE_REASK_ATTEMPTS = int(os.getenv("COMPARE_REASK_ATTEMPTS", "1"))
+
+# Per-call timeouts, in seconds
+EXTRACT_TIMEOUT = 90
+COMPARE_TIMEOUT = 40
+SUMMARY_TIMEOUT = 10
+
+# The summary is built locally; set SUMMARY_LLM=1 to also have the model
+# reword it in the background once the job has finished
+SUMMARY_LLM = os.getenv("SUMMARY_LLM", "0") == "1"
+result_cache = DiskCache("results", int(os.getenv("RESULT_CACHE_MAX_MB", "100")) * 1024 * 1024)
+
+# Resolve requirements that only cite standards and unit values locally (rules.py)
+# instead of asking the model; set PRECHECK_RULES=0 to send everything
+PRECHECK_RULES = os.getenv("PRECHECK_RULES", "1") == "1"
+
+BATCH_MAX_SUBMITTALS = int(os.getenv("BATCH_MAX_SUBMITTALS", "100"))
+
+# "page 4", "pages 3, 5 and 7", "pp. 2-3" in a verdict's provided text
+CITED_PAGES_RE = re.compile(r"\b(?:pages?|pp?\.)\s*(\d+(?:\s*(?:,|and|&|-|–)\s*\d+)*)", re.I)
+
 @app.errorhandler(413)
 def too_large(e):
-    return "File too large. Please upload files under 100MB.", 413
+    return "File too large. Please upload files under 100MB, or in chunks through /documents/uploads.", 413
+
+def make_batches(requirements, token_budget=BATCH_TOKEN_BUDGET, max_size=MAX_BATCH_SIZE):
+    # Each requirement is echoed back with provided/comment text, so budget
+    # for roughly three times its own size plus fixed per-object overhead.
+    batches = []
+    batch = []
+    used = 0
+    for req in requirements:
+        cost = count_tokens(req) * 3 + 40
+        if batch and (used + cost > token_budget or len(batch) >= max_size):
+            batches.append(batch)
+            batch = []
+            used = 0
+        batch.append(req)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def result_cache_key(requirement, excerpt_hash):
+    return content_hash(f"{COMPARE_MODEL}:{COMPARE_PROMPT_VERSION}:{excerpt_hash}:{requirement}")
+
+def compare_messages(batch, subm_excerpt):
+    return [
+        {
+            "role": "system",
+            "content": (
+                "Compare the following requirements to the submittal. "
+                "For each, return a JSON object with: requirement, provided, compliance (true/false), comment. "
+                "The submittal is given as excerpts labelled [Page N]; cite the page(s) where evidence was found in 'provided'. "
+                "Respond as a JSON array of objects. No markdown formatting."
+            )
+        },
+        {
+            "role": "user",
+            "content": f"REQUIREMENTS:\n{json.dumps(batch)}\n\nSUBMITTAL EXCERPTS:\n{subm_excerpt}"
+        }
+    ]
+
+def match_verdicts(batch, items):
+    # Returns {batch index: verdict}. Verdicts are tied to requirements by their
+    # echoed text; if the model reworded them but answered every one, by order.
+    wanted = {}
+    for i, req in enumerate(batch):
+        wanted.setdefault(normalize_requirement(req), []).append(i)
+    found = {}
+    unmatched = []
+    for item in items:
+        indices = wanted.get(normalize_requirement(item["requirement"]))
+        if indices:
+            found[indices.pop(0)] = item
+        else:
+            unmatched.append(item)
+    if unmatched and len(items) == len(batch):
+        missing = [i for i in range(len(batch)) if i not in found]
+        found.update(zip(missing, unmatched))
+    return found
+
+def request_verdicts(batch, subm_excerpt):
+    # Streams one comparison call and returns ({batch index: verdict}, error).
+    # Verdicts are parsed as they arrive and kept even if the response is cut
+    # off or partly malformed.
+    items, error = parse_stream(
+        get_client().stream(
+            compare_messages(batch, subm_excerpt),
+            model=COMPARE_MODEL,
+            temperature=0,
+            timeout=COMPARE_TIMEOUT
+        ),
+        COMPARE_ITEM_SCHEMA
+    )
+    return match_verdicts(batch, items), error
+
+async def arequest_verdicts(batch, subm_excerpt):
+    items, error = await aparse_stream(
+        get_client().astream(
+            compare_messages(batch, subm_excerpt),
+            model=COMPARE_MODEL,
+            temperature=0,
+            timeout=COMPARE_TIMEOUT
+        ),
+        COMPARE_ITEM_SCHEMA
+    )
+    return match_verdicts(batch, items), error
+
+def missing_verdicts(batch, found):
+    return [i for i in range(len(batch)) if i not in found]
+
+def collect_verdicts(batch, found, error, cache_keys):
+    items = []
+    for i, req in enumerate(batch):
+        if i in found:
+            result_cache.put(cache_keys[i], json.dumps(found[i]).encode("utf-8"))
+            items.append(found[i])
+        else:
+            items.append({
+                "requirement": req,
+                "provided": "",
+                "compliance": False,
+                "comment": f"Error: {error or 'no verdict returned'}",
+                "error": True
+            })
+    return items
+
+def error_rows(batch, error):
+    return [
+        {
+            "requirement": req,
+            "provided": "",
+            "compliance": False,
+            "comment": f"Error: {str(error)}",
+            "error": True
+        }
+        for req in batch
+    ]
+
+def check_batch(batch, subm_excerpt, cache_keys):
+    try:
+        with metrics.span("compare_batch", requirements=len(batch)):
+            found, error = request_verdicts(batch, subm_excerpt)
+            # Re-ask only for the requirements that got no usable verdict
+            for _ in range(COMPARE_REASK_ATTEMPTS):
+                missing = missing_verdicts(batch, found)
+                if not missing:
+                    break
+                log.info("Re-asking for %d of %d verdicts", len(missing), len(batch))
+                retried, error = request_verdicts([batch[i] for i in missing], subm_excerpt)
+                for n, item in retried.items():
+                    found[missing[n]] = item
+            return collect_verdicts(batch, found, error, cache_keys)
+
+    except Exception as e:
+        return error_rows(batch, e)
+
+async def acheck_batch(batch, subm_excerpt, cache_keys):
+    # check_batch() on the aio event loop (LLM_ASYNC=1)
+    try:
+        with metrics.span("compare_batch", requirements=len(batch)):
+            found, error = await arequest_verdicts(batch, subm_excerpt)
+            for _ in range(COMPARE_REASK_ATTEMPTS):
+                missing = missing_verdicts(batch, found)
+                if not missing:
+                    break
+                log.info("Re-asking for %d of %d verdicts", len(missing), len(batch))
+                retried, error = await arequest_verdicts([batch[i] for i in missing], subm_excerpt)
+                for n, item in retried.items():
+                    found[missing[n]] = item
+            # Cache writes touch disk; keep them off the loop
+            return await asyncio.to_thread(collect_verdicts, batch, found, error, cache_keys)
+
+    except Exception as e:
+        return error_rows(batch, e)
+
+def submit_batch(batch, subm_excerpt, cache_keys):
+    if LLM_ASYNC:
+        return aio.submit(acheck_batch(batch, subm_excerpt, cache_keys))
+    return metrics.submit(llm_executor, check_batch, batch, subm_excerpt, cache_keys)
+
+def requirements_cache_key(spec_hash):
+    # Spec hash first so every cached variant of one spec can be dropped by prefix
+    variant = content_hash(
+        f"{EXTRACT_MODEL}:{EXTRACT_PROMPT_VERSION}:{EXTRACT_TEMPERATURE}:"
+        f"{EXTRACT_SECTION_TOKENS}:{EXTRACT_SECTION_OVERLAP}"
+    )
+    return f"{spec_hash}-{variant[:16]}"
+
+class PartialExtraction(Exception):
+    # A section whose response broke off after some requirements were read
+    def __init__(self, requirements, error):
+        super().__init__(str(error))
+        self.requirements = requirements
+
+def extract_section_requirements(section_text, labelled=False):
+    with metrics.span("extract_section"):
+        items, error = parse_stream(
+            get_client().stream(
+                extract_messages(section_text, labelled),
+                model=EXTRACT_MODEL,
+                temperature=EXTRACT_TEMPERATURE,
+                timeout=EXTRACT_TIMEOUT
+            ),
+            ARTICLE_REQUIREMENT_SCHEMA if labelled else REQUIREMENT_SCHEMA
+        )
+        return section_requirements(items, error, labelled)
+
+async def aextract_section_requirements(section_text, labelled=False):
+    # extract_section_requirements() on the aio event loop (LLM_ASYNC=1)
+    with metrics.span("extract_section"):
+        items, error = await aparse_stream(
+            get_client().astream(
+                extract_messages(section_text, labelled),
+                model=EXTRACT_MODEL,
+                temperature=EXTRACT_TEMPERATURE,
+                timeout=EXTRACT_TIMEOUT
+            ),
+            ARTICLE_REQUIREMENT_SCHEMA if labelled else REQUIREMENT_SCHEMA
+        )
+        return section_requirements(items, error, labelled)
+
+def submit_extraction(section_text, labelled):
+    if LLM_ASYNC:
+        return aio.submit(aextract_section_requirements(section_text, labelled))
+    return metrics.submit(llm_executor, extract_section_requirements, section_text, labelled)
+
+def extract_messages(section_text, labelled=False):
+    # Labelled sections are spec articles, each preceded by its [ref] line
+    if labelled:
+        instructions = (
+            "Each article is labelled [REF] on the line before it. "
+            "Return only a valid JSON array of objects with 'article' (the REF of the article it came from) "
+            "and 'requirement' (the requirement text). No explanation. No markdown formatting."
+        )
+    else:
+        instructions = "Return only a valid JSON array of requirement strings. No explanation. No markdown formatting."
+    return [
+        {
+            "role": "system",
+            "content": (
+                "You are an architectural compliance assistant. Extract enforceable requirements from the provided specification excerpt. "
+                + instructions
+            )
+        },
+        {
+            "role": "user",
+            "content": f"SPECIFICATION:\n{section_text}"
+        }
+    ]
+
+def section_requirements(items, error, labelled):
+    # Returns [(requirement, article ref or None)]
+    requirements = [
+        (item["requirement"], item.get("article")) if labelled else (item, None)
+        for item in items
+    ]
+    requirements = [(req, ref) for req, ref in requirements if req.strip()]
+
+    log.debug("Extracted %d requirements (error: %s)", len(requirements), error)
+
+    # A section that was cut off keeps the requirements read before the cut,
+    # but is still reported as failed so the spec is not cached incomplete
+    if error is not None:
+        if not requirements:
+            raise error
+        raise PartialExtraction(requirements, error)
+
+    return requirements
+
+def extraction_sections(spec_doc):
+    # [(text, labelled)] to send as extraction calls. Structured specs are
+    # packed article by article, each under its [ref] label; anything else is
+    # split into overlapping sections of plain text.
+    if spec_doc["articles"] is None:
+        return [
+            (section, False)
+            for section in split_text(spec_doc["text"], EXTRACT_SECTION_TOKENS, EXTRACT_SECTION_OVERLAP)
+        ]
+    sections = []
+    current = []
+    used = 0
+    for article in spec_doc["articles"]:
+        for piece in split_text(article["text"], EXTRACT_SECTION_TOKENS, EXTRACT_SECTION_OVERLAP):
+            block = f"[{article['ref']}]\n{piece}"
+            cost = count_tokens(block)
+            if current and used + cost > EXTRACT_SECTION_TOKENS:
+                sections.append(("\n\n".join(current), True))
+                current = []
+                used = 0
+            current.append(block)
+            used += cost
+    if current:
+        sections.append(("\n\n".join(current), True))
+    return sections
+
+def normalize_requirement(text):
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def extract_requirements(spec_doc):
+    # Returns (requirements, article refs, spec hash, failed sections)
+    spec_hash = content_hash(spec_doc["text"])
+    key = requirements_cache_key(spec_hash)
+    cached = requirements_cache.get(key)
+    if cached is not None:
+        cached = json.loads(cached)
+        return cached["requirements"], cached["refs"], spec_hash, 0
+
+    sections = extraction_sections(spec_doc)
+    futures = [submit_extraction(text, labelled) for text, labelled in sections]
+
+    # Merge in section order; overlapping sections repeat requirements, so
+    # keep only the first occurrence of each normalized requirement
+    requirements = []
+    refs = []
+    seen = set()
+    failed_sections = 0
+    last_error = None
+    for future in futures:
+        try:
+            section_requirements = future.result()
+        except PartialExtraction as e:
+            failed_sections += 1
+            section_requirements = e.requirements
+        except Exception as e:
+            failed_sections += 1
+            last_error = e
+            continue
+        for req, ref in section_requirements:
+            normalized = normalize_requirement(req)
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                requirements.append(req)
+                refs.append(ref)
+
+    if not requirements and failed_sections == len(sections):
+        raise last_error or ValueError("Specification contained no text")
+    # Partial extractions are not cached so the next run retries the failed sections
+    if not failed_sections:
+        requirements_cache.put(key, json.dumps({"requirements": requirements, "refs": refs}).encode("utf-8"))
+    return requirements, refs, spec_hash, failed_sections
+
+def discard_uploads(uploads):
+    # Spooled form uploads are removed once the job is done with them;
+    # documents from the store are kept for the next check
+    for path, _ in uploads:
+        if not documents.is_stored(path) and os.path.exists(path):
+            os.remove(path)
+
+def run_check(job, trace, spec_upload, subm_upload, previous_run=None, meta=None):
+    with metrics.activate(trace):
+        try:
+            previous = None
+            if previous_run:
+                previous = results.snapshot(previous_run)
+                if previous is None:
+                    raise ValueError(f"Previous run {previous_run} was not found.")
+            with metrics.span("job"), RSSSampler() as rss:
+                result = check_documents(job, spec_upload, subm_upload, previous, meta)
+        except Exception:
+            metrics.jobs_total.inc(status="failed")
+            log.info("job %s trace %s", job.id, json.dumps(trace.to_dict()))
+            raise
+        finally:
+            discard_uploads((spec_upload, subm_upload))
+    metrics.jobs_total.inc(status="done")
+    result.update(rss.report(), worker_peak_rss_mb=round(peak_rss_mb(), 1))
+    result["trace"] = trace.to_dict()
+    results.record_usage(job.id, result["trace"])
+    log.info("job %s trace %s", job.id, json.dumps(result["trace"]))
+    return result
+
+def check_documents(job, spec_upload, subm_upload, previous=None, meta=None):
+    job.progress("Extracting text from PDFs")
+    pages = extract_pages(layout=("spec",), spec=spec_upload, submittal=subm_upload)
+    spec = load_spec(job, parse_spec(pages["spec"]), previous)
+    meta = dict(meta or {}, submittal_hash=subm_upload[1])
+    return check_submittal(job, spec, pages["submittal"], previous, meta)
+
+def load_spec(job, spec_doc, previous=None):
+    # Step 1: Extract enforceable requirements (cached per spec, or reused
+    # from a previous run against the same spec)
+    job.progress("Extracting requirements")
+    spec_hash = content_hash(spec_doc["text"])
+    if previous is not None and previous["spec_hash"] == spec_hash:
+        requirements, failed_sections = previous["requirements"], 0
+        refs = previous.get("refs") or [None] * len(requirements)
+        num_extracted = previous["num_extracted"]
+    else:
+        with metrics.span("extract_requirements"):
+            requirements, refs, spec_hash, failed_sections = extract_requirements(spec_doc)
+        num_extracted = len(requirements)
+    if MAX_REQUIREMENTS:
+        requirements = requirements[:MAX_REQUIREMENTS]
+        refs = refs[:MAX_REQUIREMENTS]
+    return {
+        "spec_hash": spec_hash,
+        "requirements": requirements,
+        "refs": refs,
+        "num_extracted": num_extracted,
+        "failed_sections": failed_sections
+    }
+
+def decisive_pages(pages, items, num_pages):
+    # Retrieved evidence pages plus any page the verdict's "provided" text cites
+    cited = set(pages)
+    for item in items:
+        for group in CITED_PAGES_RE.findall(str(item.get("provided") or "")):
+            for start, end in re.findall(r"(\d+)(?:\s*[-–]\s*(\d+))?", group):
+                end = min(int(end or start), int(start) + num_pages, num_pages)
+                cited.update(n for n in range(int(start), end + 1) if n >= 1)
+    return sorted(cited)
+
+def check_submittal(job, spec, subm_pages, previous=None, meta=None):
+    spec_hash = spec["spec_hash"]
+    requirements = spec["requirements"]
+    refs = spec["refs"]
+    num_extracted = spec["num_extracted"]
+    failed_sections = spec["failed_sections"]
+    page_hashes = [content_hash(page) for page in subm_pages]
+
+    # A previous run only helps if it was checked against the same spec
+    if previous is not None and previous["spec_hash"] != spec_hash:
+        previous = None
+
+    # Step 2: Retrieve the submittal chunks relevant to each requirement, reuse
+    # cached verdicts, then compare the remaining batches concurrently.
+    # Each requirement owns a slot so output keeps its order.
+    with metrics.span("retrieval_index"):
+        subm_index = SubmittalIndex(subm_pages)
+        evidence = subm_index.relevant_chunks(requirements)
+        # Pages each verdict depends on. Small submittals are sent whole, so
+        # every page is in every excerpt; these are the ones that match
+        decisive = evidence if not subm_index.send_all else subm_index.evidence_chunks(requirements)
+        facts = SubmittalFacts(subm_pages) if PRECHECK_RULES else None
+    cache_keys = [
+        result_cache_key(req, content_hash(subm_index.excerpt(chunk_ids)))
+        for req, chunk_ids in zip(requirements, evidence)
+    ]
+    slots = [None] * len(requirements)
+
+    def fill(indices, items, pages=None):
+        # Place a batch's verdicts in their requirement slots, note which
+        # spec article and submittal pages they were based on, and stream
+        # them to the page
+        if len(items) == len(indices):
+            placed = list(zip(indices, items))
+            for n, (i, item) in enumerate(placed):
+                item["pages"] = pages[n] if pages else subm_index.pages(evidence[i])
+                if refs[i]:
+                    item["article"] = refs[i]
+                slots[i] = [item]
+        else:
+            # Objects can't be tied to requirements; keep them at the batch's first slot
+            placed = [(indices[0], item) for item in items]
+            slots[indices[0]] = items
+            for i in indices[1:]:
+                slots[i] = []
+        job.emit("rows", [{"index": i, "item": item} for i, item in placed])
 
-def extract_text(file_stream):
-    doc = fitz.open(stream=file_stream.read(), filetype="pdf")
-    return "\n".join(page.get_text() for page in doc)
+    # Resubmittal mode: carry forward verdicts whose evidence pages are all
+    # still present unchanged and whose new evidence touches no changed page
+    num_carried = 0
+    if previous is not None:
+        old_page_hashes = set(previous["page_hashes"])
+        new_page_numbers = {page_hash: n for n, page_hash in enumerate(page_hashes, start=1)}
+        carried_indices = []
+        carried_items = []
+        carried_pages = []
+        for i, req in enumerate(requirements):
+            old = previous["results"].get(req)
+            if old is None or len(old["items"]) != 1:
+                continue
+            new_evidence = {page_hashes[page - 1] for page in subm_index.pages(decisive[i])}
+            if all(h in new_page_numbers for h in old["page_hashes"]) and new_evidence <= old_page_hashes:
+                carried_indices.append(i)
+                carried_items.append(dict(old["items"][0]))
+                # Unchanged pages may have moved, so cite them by their new numbers
+                carried_pages.append(sorted(new_page_numbers[h] for h in old["page_hashes"]))
+        if carried_indices:
+            fill(carried_indices, carried_items, carried_pages)
+        num_carried = len(carried_indices)
+
+    cached_indices = []
+    cached_items = []
+    for i, key in enumerate(cache_keys):
+        if slots[i] is not None:
+            continue
+        cached = result_cache.get(key)
+        if cached is not None:
+            cached_indices.append(i)
+            cached_items.append(json.loads(cached))
+    if cached_indices:
+        fill(cached_indices, cached_items)
+    num_cached = len(cached_indices)
+
+    # Requirements whose cited standards and values all appear on their
+    # evidence pages are settled locally; the rest go to the model
+    num_prechecked = 0
+    if facts is not None:
+        with metrics.span("precheck"):
+            rule_indices = []
+            rule_items = []
+            rule_pages = []
+            for i, req in enumerate(requirements):
+                if slots[i] is not None:
+                    continue
+                resolved = facts.precheck(req, subm_index.pages(evidence[i]))
+                if resolved is not None:
+                    rule_indices.append(i)
+                    rule_items.append(resolved[0])
+                    rule_pages.append(resolved[1])
+            if rule_indices:
+                fill(rule_indices, rule_items, rule_pages)
+            num_prechecked = len(rule_indices)
+    pending = [i for i, slot in enumerate(slots) if slot is None]
+
+    # Near-duplicate requirements share one check, and the rest are ordered so
+    # related requirements land in the same batch (and share excerpts)
+    with metrics.span("group_requirements", requirements=len(pending)):
+        duplicate_of, order = group_requirements([requirements[i] for i in pending])
+    duplicates = {}
+    for n, rep in enumerate(duplicate_of):
+        if rep != n:
+            duplicates.setdefault(pending[rep], []).append(pending[n])
+    num_deduped = len(pending) - len(order)
+    pending = [pending[n] for n in order]
+
+    def fan_out(indices):
+        # Copy each checked representative's verdict to its duplicates
+        for i in indices:
+            members = duplicates.get(i)
+            if not members:
+                continue
+            if len(slots[i]) != 1:
+                for j in members:
+                    slots[j] = []
+                continue
+            copies = []
+            for j in members:
+                item = {key: value for key, value in slots[i][0].items() if key not in ("pages", "article")}
+                item["requirement"] = requirements[j]
+                item["duplicate_of"] = i
+                copies.append(item)
+            fill(members, copies, [slots[i][0]["pages"]] * len(members))
+
+    batches = make_batches([requirements[i] for i in pending])
+    batch_indices = []
+    offset = 0
+    for batch in batches:
+        batch_indices.append(pending[offset:offset + len(batch)])
+        offset += len(batch)
+
+    job.progress("Checking requirements", done=0, total=len(batches))
+    futures = {
+        submit_batch(
+            batch,
+            subm_index.excerpt([chunk_id for i in indices for chunk_id in evidence[i]]),
+            [cache_keys[i] for i in indices]
+        ): indices
+        for batch, indices in zip(batches, batch_indices)
+    }
+    # Handle batches as they finish so rows stream out without waiting on the slowest
+    for done, future in enumerate(as_completed(futures), start=1):
+        fill(futures[future], future.result())
+        fan_out(futures[future])
+        job.progress(done=done)
+
+    parsed_result = [item for slot in slots for item in slot]
+
+    # Step 3: Local summary; optional LLM rewording runs after the job is done
+    job.progress("Summarizing")
+    with metrics.span("summary"):
+        summary = build_summary(parsed_result, num_extracted)
+    if SUMMARY_LLM:
+        job.on_done(lambda: llm_executor.submit(rephrase_summary, job.id, summary["text"]))
+
+    # Store the run with a snapshot a revised submittal can be checked
+    # incrementally against
+    with metrics.span("store_results"):
+        results.save_run(job.id, meta or {}, spec_hash, parsed_result, summary, {
+            "spec_hash": spec_hash,
+            "requirements": requirements,
+            "refs": refs,
+            "num_extracted": num_extracted,
+            "page_hashes": page_hashes,
+            "results": {
+                req: {
+                    "items": slot,
+                    "page_hashes": [page_hashes[page - 1] for page in decisive_pages(subm_index.pages(decisive[i]), slot, len(page_hashes))]
+                }
+                for i, (req, slot) in enumerate(zip(requirements, slots))
+                if not any(is_failure(item) for item in slot)
+            }
+        })
+
+    job.emit("summary", {
+        "summary": summary["text"],
+        "sections": summary["sections"],
+        "num_checked": len(parsed_result),
+        "num_extracted": num_extracted,
+        "failed_sections": failed_sections,
+        "run_id": job.id,
+        "num_carried": num_carried,
+        "num_prechecked": num_prechecked
+    })
+
+    return {
+        "summary": summary["text"],
+        "sections": summary["sections"],
+        "parsed_result": parsed_result,
+        "num_extracted": num_extracted,
+        "num_cached": num_cached,
+        "num_carried": num_carried,
+        "num_prechecked": num_prechecked,
+        "num_deduped": num_deduped,
+        "run_id": job.id,
+        "failed_sections": failed_sections,
+        "spec_hash": spec_hash
+    }
+
+class SubmittalJob:
+    # One submittal inside a batch job: rows and summaries are forwarded to the
+    # batch job tagged with the submittal name, progress is tracked per batch
+    def __init__(self, job, index, name):
+        self.id = f"{job.id}-{index}"
+        self.job = job
+        self.name = name
+
+    def progress(self, message=None, done=None, total=None):
+        pass
+
+    def emit(self, kind, data):
+        if kind == "rows":
+            data = [dict(row, submittal=self.name) for row in data]
+        else:
+            data = dict(data, submittal=self.name)
+            kind = f"submittal_{kind}"
+        self.job.emit(kind, data)
+
+    def on_done(self, callback):
+        pass
+
+def run_batch_check(job, trace, spec_upload, subm_uploads, meta=None):
+    # One spec, many submittals: requirements are extracted once and every
+    # submittal's comparisons share the LLM pool and its concurrency limit
+    with metrics.activate(trace):
+        try:
+            with metrics.span("job"), RSSSampler() as rss:
+                result = check_batch_documents(job, spec_upload, subm_uploads, meta)
+        except Exception:
+            metrics.jobs_total.inc(status="failed")
+            raise
+        finally:
+            discard_uploads([spec_upload] + [upload for _, upload in subm_uploads])
+    metrics.jobs_total.inc(status="done")
+    result.update(rss.report(), worker_peak_rss_mb=round(peak_rss_mb(), 1))
+    result["trace"] = trace.to_dict()
+    log.info("job %s trace %s", job.id, json.dumps(result["trace"]))
+    return result
+
+def check_batch_documents(job, spec_upload, subm_uploads, meta=None):
+    job.progress("Extracting specification text")
+    spec_pages = extract_pages(layout=("spec",), spec=spec_upload)["spec"]
+    spec = load_spec(job, parse_spec(spec_pages))
+
+    def check_one(index, name, upload):
+        # A corrupt or unreadable submittal fails on its own; the rest of the
+        # package is still checked and reported
+        subm_job = SubmittalJob(job, index, name)
+        # Each submittal's run gets its own timings and token usage; they are
+        # added to the batch trace as well
+        trace = metrics.Trace(parent=metrics.current())
+        started = time.perf_counter()
+        try:
+            with metrics.activate(trace):
+                subm_pages = extract_pages(submittal=upload)["submittal"]
+                subm_meta = dict(meta or {}, submittal_name=name, submittal_hash=upload[1])
+                result = check_submittal(subm_job, spec, subm_pages, meta=subm_meta)
+        except Exception as e:
+            log.exception("Submittal %s in job %s failed", name, job.id)
+            job.emit("submittal_error", {"submittal": name, "error": str(e)})
+            return {"name": name, "error": str(e)}
+        results.record_usage(subm_job.id, trace.to_dict(), round(time.perf_counter() - started, 3))
+        result["name"] = name
+        return result
+
+    job.progress("Checking submittals", done=0, total=len(subm_uploads))
+    futures = [
+        metrics.submit(batch_executor, check_one, index, name, upload)
+        for index, (name, upload) in enumerate(subm_uploads)
+    ]
+    submittals = []
+    for done, future in enumerate(futures, start=1):
+        submittals.append(future.result())
+        job.progress(done=done)
+
+    checked = [submittal for submittal in submittals if "error" not in submittal]
+    failed = len(submittals) - len(checked)
+    parsed_result = [item for submittal in checked for item in submittal["parsed_result"]]
+    summary = build_summary(parsed_result, spec["num_extracted"] * len(checked))
+    text = f"{len(checked)} submittals checked."
+    if failed:
+        text = f"{len(checked)} submittals checked, {failed} could not be checked."
+    if checked:
+        text = f"{text} {summary['text']}"
+    return {
+        "summary": text,
+        "failed_submittals": failed,
+        "sections": summary["sections"],
+        "submittals": submittals,
+        "num_extracted": spec["num_extracted"],
+        "failed_sections": spec["failed_sections"],
+        "spec_hash": spec["spec_hash"]
+    }
+
+def rephrase_summary(job_id, summary_text):
+    summary_prompt = [
+        {
+            "role": "system",
+            "content": "You are a construction compliance assistant. Rephrase this result into a clear 1-2 sentence project summary."
+        },
+        {
+            "role": "user",
+            "content": summary_text
+        }
+    ]
+    try:
+        rephrased = get_client().complete(
+            summary_prompt,
+            model="gpt-4o",
+            temperature=0.5,
+            timeout=SUMMARY_TIMEOUT
+        ).strip()
+    except Exception as e:
+        log.warning("GPT summary failed for job %s: %s", job_id, e)
+        return
+    jobs.update_result(job_id, summary_rephrased=rephrased)
+
+def request_value(name):
+    payload = request.get_json(silent=True) if request.is_json else None
+    return (payload or request.form).get(name)
+
+def stored_document(doc_id):
+    # (upload, name) for a document id, or LookupError when it isn't stored
+    upload = documents.upload_of(doc_id)
+    if upload is None:
+        raise LookupError(f"Document {doc_id} was not found.")
+    return upload, documents.get(doc_id)["name"]
+
+def form_document(field):
+    # (upload, name) from an <field>_id referencing the document store, else
+    # from a posted file, spooled to disk because upload streams close with
+    # the request; (None, None) when neither was sent
+    doc_id = (request_value(f'{field}_id') or '').strip()
+    if doc_id:
+        return stored_document(doc_id)
+    upload_file = request.files.get(field)
+    if not upload_file:
+        return None, None
+    with metrics.span("upload_read", document=field):
+        return spool_upload(upload_file.stream), upload_file.filename
+
+def wants_json():
+    best = request.accept_mimetypes.best_match(["application/json", "text/html"])
+    return best == "application/json"
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
+    if request.method == 'POST':
+        # Either PDFs posted with the form or ids from the document store
+        trace = metrics.Trace()
+        spec_upload = subm_upload = None
+        try:
+            with metrics.activate(trace):
+                spec_upload, spec_name = form_document('spec')
+                subm_upload, subm_name = form_document('submittal')
+        except LookupError as e:
+            discard_uploads([upload for upload in (spec_upload, subm_upload) if upload])
+            if wants_json():
+                return jsonify(error=str(e)), 404
+            abort(404)
+        if not (spec_upload and subm_upload):
+            discard_uploads([upload for upload in (spec_upload, subm_upload) if upload])
+            if wants_json():
+                return jsonify(error="Both 'spec' and 'submittal' PDFs (or 'spec_id' and 'submittal_id') are required."), 400
+            return redirect(url_for('index'))
+        previous_run = (request_value('previous_run') or '').strip() or None
+        meta = {
+            "project": (request_value('project') or '').strip() or None,
+            "spec_name": spec_name,
+            "submittal_name": subm_name
+        }
+        job_id = jobs.submit(run_check, trace, spec_upload, subm_upload, previous_run, meta)
+        if wants_json():
+            return jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id)), 202
+        return redirect(url_for('index', job=job_id), code=303)
+
     summary = None
+    sections = []
     parsed_result = []
+    num_extracted = 0
+    failed_sections = 0
+    run_id = None
+    num_carried = 0
+    num_prechecked = 0
     is_processing = False
+    job = None
 
-    if request.method == 'POST':
-        is_processing = True
-        spec_file = request.files.get('spec')
-        subm_file = request.files.get('submittal')
-
-        if spec_file and subm_file:
-            try:
-                spec_text = extract_text(spec_file)
-                subm_text = extract_text(subm_file)
-
-                # Step 1: Extract enforceable requirements
-                extract_prompt = [
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are an architectural compliance assistant. Extract enforceable requirements from the provided specification. "
-                            "Return only a valid JSON array of requirement strings. No explanation. No markdown formatting."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": f"SPECIFICATION:\n{spec_text}"
-                    }
-                ]
-
-                extract_response = openai.ChatCompletion.create(
-                    model="gpt-4o",
-                    messages=extract_prompt,
-                    temperature=0
-                )
-
-                raw_json = extract_response.choices[0].message.content.strip()
-
-                if raw_json.startswith("```json"):
-                    raw_json = raw_json[7:]
-                if raw_json.endswith("```"):
-                    raw_json = raw_json[:-3]
-                raw_json = raw_json.strip()
-
-                print("GPT extracted requirements raw JSON:")
-                print(raw_json)
-
-                if not raw_json or not raw_json.startswith("["):
-                    raise ValueError("GPT did not return valid JSON")
-
-                requirements = json.loads(raw_json)[:6]  # keep small
-                batch_size = 3
-                batches = [requirements[i:i+batch_size] for i in range(0, len(requirements), batch_size)]
-
-                parsed_result = []
-
-                for batch in batches:
-                    try:
-                        messages = [
-                            {
-                                "role": "system",
-                                "content": (
-                                    "Compare the following requirements to the submittal. "
-                                    "For each, return a JSON object with: requirement, provided, compliance (true/false), comment. "
-                                    "Respond as a JSON array of objects. No markdown formatting."
-                                )
-                            },
-                            {
-                                "role": "user",
-                                "content": f"REQUIREMENTS:\n{json.dumps(batch)}\n\nSUBMITTAL:\n{subm_text}"
-                            }
-                        ]
-
-                        response = openai.ChatCompletion.create(
-                            model="gpt-4o",
-                            messages=messages,
-                            temperature=0,
-                            request_timeout=40
-                        )
-
-                        result = response.choices[0].message.content.strip()
-                        if result.startswith("```json"):
-                            result = result[7:]
-                        if result.endswith("```"):
-                            result = result[:-3]
-                        result = result.strip()
-
-                        parsed_result.extend(json.loads(result))
-
-                    except Exception as e:
-                        for req in batch:
-                            parsed_result.append({
-                                "requirement": req,
-                                "provided": "",
-                                "compliance": False,
-                                "comment": f"Error: {str(e)}"
-                            })
-
-                # Step 3: Simple local + GPT summary
-                try:
-                    num_total = len(parsed_result)
-                    num_compliant = sum(1 for item in parsed_result if item.get("compliance") == True)
-                    basic_summary = f"{num_compliant} out of {num_total} requirements are marked compliant."
-
-                    summary_prompt = [
-                        {
-                            "role": "system",
-                            "content": "You are a construction compliance assistant. Rephrase this result into a clear 1-2 sentence project summary."
-                        },
-                        {
-                            "role": "user",
-                            "content": basic_summary
-                        }
-                    ]
-
-                    summary_response = openai.ChatCompletion.create(
-                        model="gpt-4o",
-                        messages=summary_prompt,
-                        temperature=0.5,
-                        request_timeout=10
-                    )
-
-                    summary = summary_response.choices[0].message.content.strip()
-
-                except Exception as e:
-                    summary = f"{basic_summary} (GPT summary failed: {str(e)})"
-
-            except Exception as e:
-                summary = f"⚠️ Error: {e}"
-
-        is_processing = False
-
-    return render_template('index.html', summary=summary, parsed_result=parsed_result, is_processing=is_processing)
+    job_id = request.args.get('job')
+    if job_id:
+        job = jobs.get(job_id)
+        run = results.get_run(job_id) if job is None else None
+        if run is not None:
+            # The job has expired but the run is in the results store
+            parsed_result = [
+                {
+                    "requirement": row["requirement"],
+                    "article": row["article"],
+                    "provided": row["provided"],
+                    "compliance": row["status"] == "compliant",
+                    "comment": row["comment"]
+                }
+                for row in results.iter_results(run_id=job_id)
+            ]
+            summary = run["summary"]
+            sections = build_summary(parsed_result)["sections"]
+            num_extracted = run["num_extracted"]
+            run_id = job_id
+        elif job is None:
+            summary = "⚠️ Error: job not found."
+        elif job["status"] == "done":
+            summary = job["result"].get("summary_rephrased") or job["result"]["summary"]
+            sections = job["result"]["sections"]
+            parsed_result = job["result"].get("parsed_result", [])
+            num_extracted = job["result"]["num_extracted"]
+            failed_sections = job["result"]["failed_sections"]
+            run_id = job["result"].get("run_id")
+            num_carried = job["result"].get("num_carried", 0)
+            num_prechecked = job["result"].get("num_prechecked", 0)
+        elif job["status"] == "failed":
+            summary = f"⚠️ Error: {job['error']}"
+        else:
+            is_processing = True
+
+    return render_template(
+        'index.html',
+        summary=summary,
+        sections=sections,
+        parsed_result=parsed_result,
+        is_processing=is_processing,
+        job=job,
+        num_checked=len(parsed_result),
+        num_extracted=num_extracted,
+        failed_sections=failed_sections,
+        run_id=run_id,
+        num_carried=num_carried,
+        num_prechecked=num_prechecked
+    )
+
+@app.route('/api/batch', methods=['POST'])
+def batch_check():
+    # Accepts posted PDFs ('spec', 'submittals') or document store ids
+    # ('spec_id', 'submittal_ids', a list in JSON or repeated form fields)
+    payload = request.get_json(silent=True) if request.is_json else None
+    if payload is not None:
+        subm_ids = payload.get('submittal_ids') or []
+    else:
+        subm_ids = request.form.getlist('submittal_ids')
+    subm_ids = [doc_id.strip() for doc_id in subm_ids if doc_id and doc_id.strip()]
+    subm_files = [f for f in request.files.getlist('submittals') if f.filename]
+    if not (request_value('spec_id') or request.files.get('spec')) or not (subm_ids or subm_files):
+        return jsonify(error="A spec ('spec' or 'spec_id') and at least one submittal ('submittals' or 'submittal_ids') are required."), 400
+    if len(subm_ids) + len(subm_files) > BATCH_MAX_SUBMITTALS:
+        return jsonify(error=f"At most {BATCH_MAX_SUBMITTALS} submittals per batch."), 400
+
+    try:
+        stored = [stored_document(doc_id) for doc_id in subm_ids]
+    except LookupError as e:
+        return jsonify(error=str(e)), 404
+    trace = metrics.Trace()
+    try:
+        with metrics.activate(trace):
+            spec_upload, spec_name = form_document('spec')
+            subm_uploads = [(name, upload) for upload, name in stored]
+            for subm_file in subm_files:
+                with metrics.span("upload_read", document=subm_file.filename):
+                    subm_uploads.append((subm_file.filename, spool_upload(subm_file.stream)))
+    except LookupError as e:
+        return jsonify(error=str(e)), 404
+    meta = {
+        "project": (request_value('project') or '').strip() or None,
+        "spec_name": spec_name
+    }
+    job_id = jobs.submit(run_batch_check, trace, spec_upload, subm_uploads, meta)
+    return jsonify(job_id=job_id, status_url=url_for('job_status', job_id=job_id)), 202
+
+def document_response(document, status=200):
+    return jsonify(
+        id=document["id"],
+        name=document["name"],
+        size=document["size"],
+        url=url_for('get_document', doc_id=document["id"])
+    ), status
+
+@app.route('/documents', methods=['POST'])
+def upload_document():
+    # One-shot upload of a whole PDF; a file already in the store is not kept twice
+    upload_file = request.files.get('file')
+    if not upload_file:
+        return jsonify(error="A 'file' PDF is required."), 400
+    with metrics.span("upload_read", document="document"):
+        spooled = spool_upload(upload_file.stream)
+    document, existing = documents.store_file(spooled, upload_file.filename)
+    return document_response(document, 200 if existing else 201)
+
+@app.route('/documents/<doc_id>')
+def get_document(doc_id):
+    document = documents.get(doc_id)
+    if document is None:
+        abort(404)
+    return document_response(document)
+
+@app.route('/documents/uploads', methods=['POST'])
+def start_document_upload():
+    # Resumable upload: declare the name, size and (optionally) SHA-256 of the
+    # file, then PATCH its bytes in order to the returned upload URL
+    payload = request.get_json(silent=True) or request.form
+    try:
+        size = int(payload.get('size') or 0)
+        upload, document = documents.start_upload(payload.get('name'), size, payload.get('sha256'))
+    except ValueError:
+        return jsonify(error="'size' must be a whole number of bytes."), 400
+    except documents.UploadError as e:
+        return jsonify(error=str(e)), e.status
+    if document is not None:
+        return document_response(document)
+    return upload_response(upload, 201)
+
+def upload_response(upload, status=200):
+    response = jsonify(
+        upload_id=upload["id"],
+        offset=upload["received"],
+        size=upload["size"],
+        upload_url=url_for('document_upload', upload_id=upload["id"])
+    )
+    response.status_code = status
+    response.headers['Upload-Offset'] = str(upload["received"])
+    return response
+
+@app.route('/documents/uploads/<upload_id>', methods=['GET', 'HEAD', 'PATCH', 'DELETE'])
+def document_upload(upload_id):
+    if request.method == 'DELETE':
+        if not documents.cancel_upload(upload_id):
+            abort(404)
+        return '', 204
+    if request.method in ('GET', 'HEAD'):
+        # Where to resume after a dropped connection
+        upload = documents.get_upload(upload_id)
+        if upload is None:
+            abort(404)
+        return upload_response(upload)
+
+    # PATCH: the request body is the next chunk, starting at Upload-Offset
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return jsonify(error="An 'Upload-Offset' header is required."), 400
+    try:
+        upload, document = documents.append_chunk(upload_id, offset, request.stream)
+    except documents.UploadError as e:
+        response = jsonify(error=str(e), offset=e.offset)
+        response.status_code = e.status
+        if e.offset is not None:
+            response.headers['Upload-Offset'] = str(e.offset)
+        return response
+    if document is not None:
+        return document_response(document, 201)
+    return upload_response(upload)
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    if jobs.get(job_id) is None:
+        abort(404)
+    after = int(request.headers.get('Last-Event-ID') or request.args.get('after') or 0)
+
+    def stream():
+        last_seq = after
+        last_progress = None
+        deadline = time.time() + SSE_MAX_SECONDS
+        yield "retry: 1000\n\n"
+        while time.time() < deadline:
+            # Read status before events so nothing emitted just before completion is missed
+            job = jobs.get(job_id)
+            for seq, kind, data in jobs.events(job_id, last_seq):
+                last_seq = seq
+                yield f"id: {seq}\nevent: {kind}\ndata: {data}\n\n"
+            progress = {key: job[key] for key in ("status", "message", "done", "total")}
+            if progress != last_progress:
+                last_progress = progress
+                yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+            if job["status"] in ("done", "failed"):
+                yield f"event: {job['status']}\ndata: {json.dumps({'error': job['error']})}\n\n"
+                return
+            time.sleep(0.5)
+
+    return Response(
+        stream(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def export_response(rows, fmt, filename):
+    # Stream rows as CSV or a JSON array without building the whole body
+    if fmt == 'csv':
+        def body():
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(results.EXPORT_COLUMNS)
+            for row in rows:
+                writer.writerow([row[column] for column in results.EXPORT_COLUMNS])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        mimetype = 'text/csv'
+    else:
+        def body():
+            yield "["
+            for n, row in enumerate(rows):
+                row["pages"] = json.loads(row["pages"] or "[]")
+                yield ("," if n else "") + json.dumps(row)
+            yield "]"
+        mimetype = 'application/json'
+    return Response(
+        body(),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+@app.route('/runs')
+def list_runs():
+    limit = min(int(request.args.get('limit') or results.RUNS_PAGE_SIZE), 500)
+    runs, next_cursor = results.list_runs(
+        project=request.args.get('project'),
+        before=request.args.get('before'),
+        limit=limit
+    )
+    next_url = url_for('list_runs', project=request.args.get('project'), before=next_cursor, limit=limit) if next_cursor else None
+    return jsonify(runs=runs, next=next_url)
+
+@app.route('/runs/<run_id>')
+def get_run(run_id):
+    run = results.get_run(run_id)
+    if run is None:
+        abort(404)
+    return jsonify(run)
+
+@app.route('/runs/<run_id>/export')
+def export_run(run_id):
+    if results.get_run(run_id) is None:
+        abort(404)
+    fmt = 'csv' if request.args.get('format') == 'csv' else 'json'
+    return export_response(results.iter_results(run_id=run_id), fmt, f"run-{run_id}")
+
+@app.route('/results/export')
+def export_results():
+    # Verdicts across runs, filtered by project, spec section and/or status
+    # (compliant, noncompliant, failed)
+    fmt = 'csv' if request.args.get('format') == 'csv' else 'json'
+    rows = results.iter_results(
+        project=request.args.get('project'),
+        section=request.args.get('section'),
+        status=request.args.get('status')
+    )
+    return export_response(rows, fmt, "results")
+
+@app.route('/metrics')
+def prometheus_metrics():
+    client = get_client()
+    gauges = {
+        "submittal_text_cache_hits": ("Page text cache hits in this process.", text_cache.hits),
+        "submittal_text_cache_misses": ("Page text cache misses in this process.", text_cache.misses),
+        "submittal_layout_cache_hits": ("Spec layout cache hits in this process.", layout_cache.hits),
+        "submittal_layout_cache_misses": ("Spec layout cache misses in this process.", layout_cache.misses),
+        "submittal_result_cache_hits": ("Result cache hits in this process.", result_cache.hits),
+        "submittal_result_cache_misses": ("Result cache misses in this process.", result_cache.misses)
+    }
+    if LLM_ASYNC:
+        gauges["submittal_llm_async_in_flight"] = ("Comparison calls running on the event loop in this process.", aio.in_flight())
+    if client.limiter is not None:
+        gauges["submittal_llm_queue_depth"] = ("LLM calls waiting on the rate limiter, all workers.", client.limiter.queue_depth())
+    return Response(metrics.render(gauges), mimetype='text/plain; version=0.0.4')
+
+@app.route('/llm/stats')
+def llm_stats():
+    client = get_client()
+    rate_limit = client.limiter.stats() if client.limiter is not None else None
+    return jsonify(backend=client.name, rate_limit=rate_limit, **client.stats.snapshot())
+
+@app.route('/cache/stats')
+def cache_stats():
+    return jsonify(
+        text=text_cache.stats(),
+        layout=layout_cache.stats(),
+        documents=documents.stats(),
+        requirements=requirements_cache.stats(),
+        results=result_cache.stats()
+    )
+
+@app.route('/cache/requirements/invalidate', methods=['POST'])
+def invalidate_requirements():
+    # Drop cached requirements for one spec (by spec_hash) or, with no hash, all of them
+    payload = request.get_json(silent=True) or request.form
+    spec_hash = payload.get('spec_hash')
+    if spec_hash:
+        removed = requirements_cache.delete_prefix(f"{spec_hash}-")
+    else:
+        removed = requirements_cache.clear()
+    return jsonify(removed=removed)
 
 if __name__ == '__main__':
     app.run(debug=True)
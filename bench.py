@@ -0,0 +1,223 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Offline end-to-end benchmark: generates synthetic spec/submittal PDF pairs,
+# runs the check pipeline against the mock LLM backend and reports per-stage
+# wall time, throughput, peak memory and tokens sent.
+#
+#   python bench.py --pages 10 100 1000 --latency 0.5
+
+MATERIALS = ["steel stud", "gypsum board", "door frame", "hinge", "sealant", "insulation", "anchor", "fastener"]
+STANDARDS = ["ASTM C645", "ASTM C1396", "UL 263", "ANSI A250.8", "ASTM C920", "ASTM E84"]
+UNITS = [("psi", 1000, 5000), ("gauge", 14, 25), ("inches", 1, 12), ("STC", 35, 60)]
+
+SPEC_LINES_PER_PAGE = 8
+SPEC_HEADER = "RIVERSIDE MEDICAL OFFICE BUILDING - ISSUED FOR CONSTRUCTION 2024-03-15"
+SPEC_FOOTER = "GYPSUM BOARD ASSEMBLIES 09 21 16 - {page}"
+# PART 1 administrative text; structure-aware parsing should never send it to extraction
+SPEC_PART_1 = [
+    "PART 1 - GENERAL",
+    "1.1 SUBMITTALS",
+    "A. Contractor shall provide product data for each product within 14 days.",
+    "B. Contractor shall comply with Division 01 submittal procedures.",
+    "PART 2 - PRODUCTS"
+]
+SUBMITTAL_MATCH_RATE = 0.7
+
+
+def spec_line(rng, page, n):
+    material = rng.choice(MATERIALS)
+    unit, low, high = rng.choice(UNITS)
+    return (
+        f"2.{page % 9 + 1}.{n} The {material} shall comply with {rng.choice(STANDARDS)} "
+        f"and provide a minimum of {rng.randint(low, high)} {unit}."
+    )
+
+
+def write_pdf(path, pages, header=None, footer=None):
+    import fitz  # PyMuPDF
+
+    doc = fitz.open()
+    for number, lines in enumerate(pages, start=1):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (48, 72, -48, -72), "\n".join(lines), fontsize=8)
+        if header:
+            page.insert_text((48, 36), header, fontsize=7)
+        if footer:
+            page.insert_text((48, page.rect.height - 30), footer.format(page=number), fontsize=7)
+    doc.save(path)
+    doc.close()
+
+
+def generate_pair(directory, num_pages, seed=0):
+    rng = random.Random(seed)
+    spec_pages = []
+    subm_pages = []
+    for page in range(num_pages):
+        lines = [spec_line(rng, page, n) for n in range(SPEC_LINES_PER_PAGE)]
+        spec_pages.append(lines)
+        subm_pages.append([f"PRODUCT DATA - SHEET {page + 1}"] + [
+            line.split(" ", 1)[1].replace(" shall comply with ", " complies with ").replace(" and provide ", " and provides ")
+            for line in lines
+            if rng.random() < SUBMITTAL_MATCH_RATE
+        ])
+    spec_pages[0] = ["SECTION 09 21 16 - GYPSUM BOARD ASSEMBLIES"] + SPEC_PART_1 + spec_pages[0]
+    spec_pages[-1] = spec_pages[-1] + ["END OF SECTION 09 21 16"]
+    spec_path = os.path.join(directory, f"spec-{num_pages}.pdf")
+    subm_path = os.path.join(directory, f"submittal-{num_pages}.pdf")
+    write_pdf(spec_path, spec_pages, SPEC_HEADER, SPEC_FOOTER)
+    write_pdf(subm_path, subm_pages)
+    return spec_path, subm_path
+
+
+class BenchJob:
+    # Stands in for jobs.Job
+    id = "bench"
+
+    def __init__(self):
+        self.rows = 0
+
+    def progress(self, message=None, done=None, total=None):
+        pass
+
+    def emit(self, kind, data):
+        if kind == "rows":
+            self.rows += len(data)
+
+    def on_done(self, callback):
+        pass
+
+
+def covered_seconds(spans):
+    # Wall time covered by possibly overlapping spans
+    covered = 0
+    end = None
+    for start, stop in sorted((span["start"], span["start"] + span["seconds"]) for span in spans):
+        if end is None or start > end:
+            covered += stop - start
+            end = stop
+        elif stop > end:
+            covered += stop - end
+            end = stop
+    return covered
+
+
+def stage_times(spans, total):
+    # Per span name: wall time covered, summed time and count. Spans of one
+    # name overlap when they run concurrently (sections, comparison batches),
+    # so the sum can exceed the wall time. "untraced" is job time outside
+    # every span.
+    stages = {}
+    for name in dict.fromkeys(span["name"] for span in spans):
+        named = [span for span in spans if span["name"] == name]
+        stages[name] = {
+            "seconds": round(covered_seconds(named), 3),
+            "summed_seconds": round(sum(span["seconds"] for span in named), 3),
+            "count": len(named)
+        }
+    stages["untraced"] = {"seconds": round(max(0, total - covered_seconds(spans)), 3), "summed_seconds": None, "count": 0}
+    return stages
+
+
+def run_case(num_pages, latency, concurrency, async_llm=False):
+    # Runs in a fresh process so caches start cold and peak RSS is per case
+    work_dir = tempfile.mkdtemp(prefix="bench-")
+    os.environ["DATA_DIR"] = work_dir
+    os.environ["LLM_BACKEND"] = "mock"
+    os.environ["LLM_MOCK_LATENCY"] = str(latency)
+    os.environ["CHECK_MAX_WORKERS"] = str(concurrency)
+    os.environ["LLM_ASYNC"] = "1" if async_llm else "0"
+    # Same in-flight limit in both modes, so only the way calls wait differs
+    os.environ["LLM_ASYNC_MAX_CALLS"] = str(concurrency)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+    started = time.perf_counter()
+    spec_path, subm_path = generate_pair(work_dir, num_pages)
+    generate_seconds = time.perf_counter() - started
+
+    import app
+    import metrics
+    from cache import content_hash
+    from llm import get_client
+    from pdf import peak_rss_mb
+
+    uploads = []
+    for path in (spec_path, subm_path):
+        with open(path, "rb") as f:
+            uploads.append((path, content_hash(f.read())))
+
+    job = BenchJob()
+    trace = metrics.Trace()
+    started = time.perf_counter()
+    with metrics.activate(trace):
+        result = app.check_documents(job, *uploads)
+    finished = time.perf_counter()
+
+    stats = get_client().stats.snapshot()
+    total = finished - started
+    stages = stage_times(trace.to_dict()["spans"], total)
+    return {
+        "pages": num_pages,
+        "generate_seconds": round(generate_seconds, 3),
+        "total_seconds": round(total, 3),
+        "stages": stages,
+        "requirements_extracted": result["num_extracted"],
+        "requirements_checked": len(result["parsed_result"]),
+        "pages_per_second": round(2 * num_pages / total, 1),
+        "requirements_per_second": round(len(result["parsed_result"]) / total, 1),
+        "llm_calls": stats["calls"],
+        "prompt_tokens": stats["prompt_tokens"],
+        "completion_tokens": stats["completion_tokens"],
+        "peak_rss_mb": round(peak_rss_mb(), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the submittal check pipeline offline.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000],
+                        help="spec/submittal sizes to run, in pages")
+    parser.add_argument("--latency", type=float, default=0.2,
+                        help="simulated seconds per mock LLM call")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="CHECK_MAX_WORKERS for the run")
+    parser.add_argument("--async-llm", action="store_true",
+                        help="await comparison calls on the event loop (LLM_ASYNC=1)")
+    parser.add_argument("--json", metavar="PATH", help="also write results as JSON")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for num_pages in args.pages:
+        # Not multiprocessing.Pool: its daemonic workers can't start the
+        # PDF extraction process pool that large documents use
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, num_pages, args.latency, args.concurrency, args.async_llm).result()
+        results.append(result)
+        stages = ", ".join(
+            f"{name}: {stage['seconds']}s" + (
+                f" ({stage['count']}x, {stage['summed_seconds']}s summed)" if stage["count"] > 1 else ""
+            )
+            for name, stage in result["stages"].items()
+        )
+        print(
+            f"{num_pages:>6} pages  total {result['total_seconds']:>8}s  "
+            f"{result['pages_per_second']:>7} pages/s  {result['requirements_per_second']:>7} req/s  "
+            f"{result['llm_calls']:>5} calls  {result['prompt_tokens']:>9} prompt tokens  "
+            f"peak {result['peak_rss_mb']} MB"
+        )
+        print(f"        {stages}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import uuid
+import hashlib
+import threading
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(DATA_DIR, "cache"))
+
+
+def content_hash(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+class DiskCache:
+    # Files on local disk keyed by content hash. A hit touches the file's
+    # mtime, so evicting oldest-mtime-first once the directory grows past
+    # max_bytes gives least-recently-used eviction.
+
+    def __init__(self, name, max_bytes):
+        self.name = name
+        self.root = os.path.join(CACHE_DIR, name)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Running size estimate so put() only walks the directory when eviction may be due
+        self._size = None
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def open(self, key, mode="rb"):
+        # Streaming variant of get(): returns an open file, or None on a miss
+        path = self._path(key)
+        try:
+            f = open(path, mode)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return f
+
+    def staging_path(self, key):
+        # Write a new entry here, then commit() it once it is complete
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{uuid.uuid4().hex}.tmp"
+
+    def commit(self, key, tmp_path):
+        os.replace(tmp_path, self._path(key))
+        added = os.path.getsize(self._path(key))
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += added
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def put(self, key, data):
+        tmp_path = self.staging_path(key)
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        self.commit(key, tmp_path)
+
+    def delete(self, key):
+        with self._lock:
+            self._size = None
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            self._size = None
+        removed = 0
+        for path, _, _ in self._entries():
+            if os.path.basename(path).startswith(prefix):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._size = None
+        removed = 0
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        with self._lock:
+            self._size = total
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes
+        }
@@ -0,0 +1,217 @@
+import os
+import time
+import fcntl
+import uuid
+import sqlite3
+import hashlib
+
+# Uploaded PDFs, stored once per content hash and referenced by id from check
+# requests. Large files arrive as resumable uploads: the client PATCHes chunks at
+# the current offset and, after a dropped connection, asks for the offset and
+# carries on from there.
+DATA_DIR = os.getenv("DATA_DIR", "data")
+DOCUMENTS_DIR = os.getenv("DOCUMENTS_DIR", os.path.join(DATA_DIR, "documents"))
+DOCUMENTS_DB_PATH = os.getenv("DOCUMENTS_DB_PATH", os.path.join(DATA_DIR, "documents.db"))
+DOCUMENT_MAX_MB = int(os.getenv("DOCUMENT_MAX_MB", "1024"))
+# Unfinished uploads are dropped after this long without a chunk
+UPLOAD_TTL_SECONDS = int(os.getenv("UPLOAD_TTL_SECONDS", str(24 * 3600)))
+CHUNK_SIZE = 1024 * 1024
+
+PARTIAL_DIR = os.path.join(DOCUMENTS_DIR, "partial")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    id TEXT PRIMARY KEY,
+    name TEXT,
+    size INTEGER NOT NULL,
+    received INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+
+class UploadError(Exception):
+    # status is the HTTP status the API answers with
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def _connect():
+    os.makedirs(os.path.dirname(DOCUMENTS_DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(DOCUMENTS_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def document_path(doc_id):
+    return os.path.join(DOCUMENTS_DIR, doc_id[:2], f"{doc_id}.pdf")
+
+
+def _partial_path(upload_id):
+    return os.path.join(PARTIAL_DIR, upload_id)
+
+
+def is_stored(path):
+    # Stored documents outlive the jobs that read them; spooled uploads don't
+    return os.path.commonpath([os.path.abspath(path), os.path.abspath(DOCUMENTS_DIR)]) == os.path.abspath(DOCUMENTS_DIR)
+
+
+def get(doc_id):
+    # The id is the SHA-256 of the file's bytes
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM documents WHERE id = ?", (doc_id,)).fetchone()
+    if row is None or not os.path.exists(document_path(doc_id)):
+        return None
+    return dict(row)
+
+
+def upload_of(doc_id):
+    # (path, key) as taken by pdf.extract_pages(), or None for an unknown id
+    if get(doc_id) is None:
+        return None
+    return document_path(doc_id), doc_id
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _store(path, name, doc_id=None):
+    # Move a complete file into the store, or drop it when the same bytes are
+    # already there. Returns (document, existing).
+    doc_id = doc_id or _file_hash(path)
+    existing = get(doc_id)
+    if existing is not None:
+        os.remove(path)
+        return existing, True
+    target = document_path(doc_id)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    size = os.path.getsize(path)
+    os.replace(path, target)
+    with _connect() as conn:
+        conn.execute(
+            "INSERT OR IGNORE INTO documents (id, name, size, created) VALUES (?, ?, ?, ?)",
+            (doc_id, name, size, time.time())
+        )
+    return get(doc_id), False
+
+
+def store_file(spooled, name):
+    # spooled is the (path, sha256) pair from pdf.spool_upload()
+    path, doc_id = spooled
+    return _store(path, name, doc_id)
+
+
+def start_upload(name, size, sha256=None):
+    # Returns (upload, document). A client that sends the hash of a file the
+    # store already has gets the document back and never sends the bytes.
+    if sha256:
+        document = get(sha256.lower())
+        if document is not None:
+            return None, document
+    if size <= 0:
+        raise UploadError("Upload size must be positive.")
+    if size > DOCUMENT_MAX_MB * 1024 * 1024:
+        raise UploadError(f"Documents are limited to {DOCUMENT_MAX_MB}MB.", status=413)
+
+    upload_id = uuid.uuid4().hex
+    now = time.time()
+    os.makedirs(PARTIAL_DIR, exist_ok=True)
+    open(_partial_path(upload_id), "wb").close()
+    with _connect() as conn:
+        expired = conn.execute("SELECT id FROM uploads WHERE updated < ?", (now - UPLOAD_TTL_SECONDS,)).fetchall()
+        conn.execute("DELETE FROM uploads WHERE updated < ?", (now - UPLOAD_TTL_SECONDS,))
+        conn.execute(
+            "INSERT INTO uploads (id, name, size, created, updated) VALUES (?, ?, ?, ?, ?)",
+            (upload_id, name, size, now, now)
+        )
+    for row in expired:
+        if os.path.exists(_partial_path(row["id"])):
+            os.remove(_partial_path(row["id"]))
+    return get_upload(upload_id), None
+
+
+def get_upload(upload_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def append_chunk(upload_id, offset, stream):
+    # Write one chunk at offset, which must be where the last one ended.
+    # Returns (upload, document); document is set once the last byte arrives.
+    path = _partial_path(upload_id)
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        raise UploadError("Upload not found.", status=404)
+    with f:
+        # A lock on the partial file rather than the database, so a slow
+        # chunk only holds up its own upload
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError("Another chunk of this upload is still being received.", status=409)
+        upload = get_upload(upload_id)
+        if upload is None:
+            raise UploadError("Upload not found.", status=404)
+        if offset != upload["received"]:
+            raise UploadError("Offset does not match the bytes received.", status=409, offset=upload["received"])
+
+        received = upload["received"]
+        # Drop anything a broken earlier request wrote past the last commit
+        f.truncate(received)
+        f.seek(received)
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if received > upload["size"]:
+                raise UploadError("Chunk runs past the declared upload size.")
+            f.write(chunk)
+        f.flush()
+        upload.update(received=received, updated=time.time())
+        with _connect() as conn:
+            if received < upload["size"]:
+                conn.execute(
+                    "UPDATE uploads SET received = ?, updated = ? WHERE id = ?",
+                    (received, upload["updated"], upload_id)
+                )
+                return upload, None
+            conn.execute("DELETE FROM uploads WHERE id = ?", (upload_id,))
+    document, _ = _store(path, upload["name"])
+    return upload, document
+
+
+def cancel_upload(upload_id):
+    with _connect() as conn:
+        removed = conn.execute("DELETE FROM uploads WHERE id = ?", (upload_id,)).rowcount
+    if os.path.exists(_partial_path(upload_id)):
+        os.remove(_partial_path(upload_id))
+    return bool(removed)
+
+
+def stats():
+    with _connect() as conn:
+        row = conn.execute("SELECT COUNT(*) AS documents, COALESCE(SUM(size), 0) AS bytes FROM documents").fetchone()
+        pending = conn.execute("SELECT COUNT(*) FROM uploads").fetchone()[0]
+    return {"documents": row["documents"], "bytes": row["bytes"], "uploads_in_progress": pending}
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# Jobs run on a local thread pool; their state lives in SQLite so any
+# gunicorn worker can answer status polls, not just the one that enqueued.
+DATA_DIR = os.getenv("DATA_DIR", "data")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(DATA_DIR, "jobs.db"))
+# Each running job holds one of these threads. With LLM_ASYNC=1 its model calls
+# are awaited on the aio loop and the thread mostly waits on their futures, so
+# many more jobs can run at once; LLM_ASYNC_MAX_CALLS still bounds the calls.
+# Past a few dozen, one process is CPU-bound anyway (see README), so more
+# concurrency comes from more gunicorn workers rather than more threads.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "16" if os.getenv("LLM_ASYNC", "0") == "1" else "2"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", str(24 * 3600)))
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    message TEXT,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, seq);
+"""
+
+
+def _connect():
+    os.makedirs(os.path.dirname(JOB_DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _update(job_id, **fields):
+    fields["updated"] = time.time()
+    columns = ", ".join(f"{name} = ?" for name in fields)
+    with _connect() as conn:
+        conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+
+class Job:
+    def __init__(self, job_id):
+        self.id = job_id
+        self._on_done = []
+
+    def on_done(self, callback):
+        # Run callback once the job's result has been stored
+        self._on_done.append(callback)
+
+    def progress(self, message=None, done=None, total=None):
+        fields = {}
+        if message is not None:
+            fields["message"] = message
+        if done is not None:
+            fields["done"] = done
+        if total is not None:
+            fields["total"] = total
+        _update(self.id, **fields)
+
+    def emit(self, kind, data):
+        # Append an event for streaming clients (see events())
+        with _connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, kind, data) VALUES (?, ?, ?)",
+                (self.id, kind, json.dumps(data))
+            )
+
+
+def submit(fn, *args):
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            "DELETE FROM job_events WHERE job_id IN (SELECT id FROM jobs WHERE updated < ?)",
+            (now - JOB_TTL_SECONDS,)
+        )
+        conn.execute("DELETE FROM jobs WHERE updated < ?", (now - JOB_TTL_SECONDS,))
+        conn.execute(
+            "INSERT INTO jobs (id, status, message, created, updated) VALUES (?, 'queued', 'Queued', ?, ?)",
+            (job_id, now, now)
+        )
+    _executor.submit(_run, job_id, fn, args)
+    return job_id
+
+
+def _run(job_id, fn, args):
+    _update(job_id, status="running", message="Starting")
+    job = Job(job_id)
+    try:
+        result = fn(job, *args)
+        _update(job_id, status="done", message="Done", result=json.dumps(result))
+    except Exception as e:
+        traceback.print_exc()
+        _update(job_id, status="failed", message="Failed", error=str(e))
+        return
+    for callback in job._on_done:
+        try:
+            callback()
+        except Exception:
+            traceback.print_exc()
+
+
+def update_result(job_id, **fields):
+    # Merge fields into a finished job's result
+    with _connect() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row["result"] is None:
+            return
+        result = json.loads(row["result"])
+        result.update(fields)
+        conn.execute(
+            "UPDATE jobs SET result = ?, updated = ? WHERE id = ?",
+            (json.dumps(result), time.time(), job_id)
+        )
+
+
+def get(job_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def events(job_id, after=0):
+    with _connect() as conn:
+        rows = conn.execute(
+            "SELECT seq, kind, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq",
+            (job_id, after)
+        ).fetchall()
+    return [(row["seq"], row["kind"], row["data"]) for row in rows]
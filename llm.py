@@ -0,0 +1,336 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+
+import openai
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from tokens import count_tokens
+from ratelimit import RateLimiter
+import metrics
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "16"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+# Completion tokens assumed per call when reserving rate-limit capacity
+LLM_COMPLETION_ESTIMATE = int(os.getenv("LLM_COMPLETION_ESTIMATE", "800"))
+# Simulated per-call latency for the mock backend, in seconds
+LLM_MOCK_LATENCY = float(os.getenv("LLM_MOCK_LATENCY", "0"))
+# Size of the pieces the mock backend streams its answer in
+MOCK_CHUNK_CHARS = 64
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class CallStats:
+    # Per-process call counters plus a window of recent latencies for percentiles
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latencies = deque(maxlen=window)
+
+    def record(self, latency, retries, usage=None, failed=False):
+        with self._lock:
+            self.calls += 1
+            self.retries += retries
+            if failed:
+                self.failures += 1
+            else:
+                self.latencies.append(latency)
+            if usage:
+                self.prompt_tokens += usage.get("prompt_tokens", 0)
+                self.completion_tokens += usage.get("completion_tokens", 0)
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            snapshot = {
+                "calls": self.calls,
+                "failures": self.failures,
+                "retries": self.retries,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens
+            }
+        for name, q in (("p50", 0.5), ("p95", 0.95)):
+            snapshot[f"latency_{name}"] = latencies[int(q * (len(latencies) - 1))] if latencies else None
+        return snapshot
+
+
+class LLMClient:
+    name = "base"
+
+    def __init__(self, limiter=None):
+        self.stats = CallStats()
+        self.limiter = limiter
+
+    def complete(self, messages, model, temperature=0, timeout=LLM_TIMEOUT):
+        # Returns the assistant message text. Retryable errors are retried with
+        # full-jitter exponential backoff; anything else is raised immediately.
+        started = time.monotonic()
+        attempt = 0
+        estimate = sum(count_tokens(message["content"]) for message in messages) + LLM_COMPLETION_ESTIMATE
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire(estimate)
+            try:
+                text, usage = self._create(messages, model, temperature, timeout)
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES or not self.is_retryable(e):
+                    self.stats.record(time.monotonic() - started, attempt, failed=True)
+                    metrics.record_llm_call(time.monotonic() - started, attempt, failed=True)
+                    raise
+                time.sleep(self.backoff(attempt, e))
+                attempt += 1
+                continue
+            self.stats.record(time.monotonic() - started, attempt, usage)
+            metrics.record_llm_call(time.monotonic() - started, attempt, usage)
+            return text
+
+    def stream(self, messages, model, temperature=0, timeout=LLM_TIMEOUT):
+        # Yields the assistant message text in pieces as it arrives. Errors
+        # before the first piece are retried like complete(); once text has
+        # been yielded a failure is raised to the caller, which keeps what it has.
+        started = time.monotonic()
+        attempt = 0
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire(prompt_tokens + LLM_COMPLETION_ESTIMATE)
+            pieces = []
+            try:
+                for piece in self._stream(messages, model, temperature, timeout):
+                    pieces.append(piece)
+                    yield piece
+            except Exception as e:
+                if pieces or attempt >= LLM_MAX_RETRIES or not self.is_retryable(e):
+                    self.stats.record(time.monotonic() - started, attempt, failed=True)
+                    metrics.record_llm_call(time.monotonic() - started, attempt, failed=True)
+                    raise
+                time.sleep(self.backoff(attempt, e))
+                attempt += 1
+                continue
+            # Streamed responses carry no usage block, so count it ourselves
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": count_tokens("".join(pieces))}
+            self.stats.record(time.monotonic() - started, attempt, usage)
+            metrics.record_llm_call(time.monotonic() - started, attempt, usage)
+            return
+
+    async def astream(self, messages, model, temperature=0, timeout=LLM_TIMEOUT):
+        # stream() as an async generator, for calls made on the aio event loop
+        started = time.monotonic()
+        attempt = 0
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        while True:
+            if self.limiter is not None:
+                # The limiter blocks on SQLite and sleeps; keep that off the loop
+                await asyncio.to_thread(self.limiter.acquire, prompt_tokens + LLM_COMPLETION_ESTIMATE)
+            pieces = []
+            try:
+                async for piece in self._astream(messages, model, temperature, timeout):
+                    pieces.append(piece)
+                    yield piece
+            except Exception as e:
+                if pieces or attempt >= LLM_MAX_RETRIES or not self.is_retryable(e):
+                    self.stats.record(time.monotonic() - started, attempt, failed=True)
+                    metrics.record_llm_call(time.monotonic() - started, attempt, failed=True)
+                    raise
+                await asyncio.sleep(self.backoff(attempt, e))
+                attempt += 1
+                continue
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": count_tokens("".join(pieces))}
+            self.stats.record(time.monotonic() - started, attempt, usage)
+            metrics.record_llm_call(time.monotonic() - started, attempt, usage)
+            return
+
+    def backoff(self, attempt, error):
+        retry_after = getattr(error, "headers", None) and error.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), LLM_BACKOFF_MAX)
+            except ValueError:
+                pass
+        return random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+
+    def is_retryable(self, error):
+        return False
+
+    def _create(self, messages, model, temperature, timeout):
+        raise NotImplementedError
+
+    def _stream(self, messages, model, temperature, timeout):
+        yield self._create(messages, model, temperature, timeout)[0]
+
+    async def _astream(self, messages, model, temperature, timeout):
+        text, _ = await asyncio.to_thread(self._create, messages, model, temperature, timeout)
+        yield text
+
+
+class OpenAIClient(LLMClient):
+    name = "openai"
+
+    def __init__(self, pool_size=LLM_POOL_SIZE):
+        super().__init__(limiter=RateLimiter())
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+        # openai 0.27 sends every request through this session when it is set,
+        # so all threads share one bounded keep-alive connection pool
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        openai.requestssession = self.session
+        self.pool_size = pool_size
+        self._aiosession = None
+
+    def is_retryable(self, error):
+        if isinstance(error, (openai.error.Timeout, openai.error.APIConnectionError,
+                              openai.error.RateLimitError, openai.error.ServiceUnavailableError)):
+            return True
+        return getattr(error, "http_status", None) in RETRYABLE_STATUS
+
+    def _create(self, messages, model, temperature, timeout):
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            request_timeout=timeout
+        )
+        return response.choices[0].message.content, response.get("usage")
+
+    def _stream(self, messages, model, temperature, timeout):
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            request_timeout=timeout,
+            stream=True
+        )
+        for chunk in response:
+            piece = chunk.choices[0].delta.get("content")
+            if piece:
+                yield piece
+
+    async def _astream(self, messages, model, temperature, timeout):
+        # acreate() goes through aiohttp; one session per process (created on
+        # the aio loop, which is the only loop that calls this) pools connections
+        if self._aiosession is None:
+            self._aiosession = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        openai.aiosession.set(self._aiosession)
+        response = await openai.ChatCompletion.acreate(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            request_timeout=timeout,
+            stream=True
+        )
+        async for chunk in response:
+            piece = chunk.choices[0].delta.get("content")
+            if piece:
+                yield piece
+
+
+class MockClient(LLMClient):
+    # Deterministic offline backend for load tests and local development. It
+    # recognises the app's three prompts and answers them from the input text.
+    name = "mock"
+
+    def __init__(self, latency=LLM_MOCK_LATENCY):
+        super().__init__()
+        self.latency = latency
+
+    def _create(self, messages, model, temperature, timeout):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(messages)
+
+    def _answer(self, messages):
+        system = messages[0]["content"]
+        user = messages[-1]["content"]
+        if "Extract enforceable requirements" in system:
+            text = json.dumps(self._requirements(user, labelled="labelled [" in system))
+        elif "Compare the following requirements" in system:
+            text = json.dumps(self._compare(user))
+        else:
+            text = user
+        usage = {
+            "prompt_tokens": sum(count_tokens(message["content"]) for message in messages),
+            "completion_tokens": count_tokens(text)
+        }
+        return text, usage
+
+    def _stream(self, messages, model, temperature, timeout):
+        text = self._create(messages, model, temperature, timeout)[0]
+        for start in range(0, len(text), MOCK_CHUNK_CHARS):
+            yield text[start:start + MOCK_CHUNK_CHARS]
+
+    async def _astream(self, messages, model, temperature, timeout):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        text = self._answer(messages)[0]
+        for start in range(0, len(text), MOCK_CHUNK_CHARS):
+            yield text[start:start + MOCK_CHUNK_CHARS]
+
+    def _requirements(self, user, labelled=False):
+        body = user.split("\n", 1)[-1]
+        found = []
+        label = None
+        for line in body.split("\n"):
+            match = re.match(r"^\[(.+)\]$", line.strip())
+            if labelled and match:
+                label = match.group(1)
+                continue
+            for sentence in re.split(r"(?<=[.;])\s+", line):
+                if re.search(r"\b(shall|must|provide|comply)\b", sentence, re.I):
+                    requirement = " ".join(sentence.split())
+                    found.append({"article": label, "requirement": requirement} if labelled else requirement)
+        return found
+
+    def _compare(self, user):
+        head, _, excerpt = user.partition("\n\nSUBMITTAL")
+        requirements = json.loads(head.split("\n", 1)[-1])
+        excerpt_words = set(re.findall(r"[a-z0-9]+", excerpt.lower()))
+        pages = re.findall(r"\[Page (\d+)\]", excerpt)
+        results = []
+        for req in requirements:
+            words = set(re.findall(r"[a-z0-9]+", req.lower()))
+            overlap = len(words & excerpt_words) / (len(words) or 1)
+            compliant = overlap >= 0.6
+            results.append({
+                "requirement": req,
+                "provided": f"See page {pages[0]}" if compliant and pages else "",
+                "compliance": compliant,
+                "comment": f"Mock check: {overlap:.0%} of requirement terms found in submittal."
+            })
+        return results
+
+
+BACKENDS = {
+    "openai": OpenAIClient,
+    "mock": MockClient
+}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            if LLM_BACKEND not in BACKENDS:
+                raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; expected one of {sorted(BACKENDS)}")
+            _client = BACKENDS[LLM_BACKEND]()
+        return _client
@@ -0,0 +1,213 @@
+import time
+import bisect
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+# In-process metrics rendered in the Prometheus text format at /metrics, plus
+# per-job traces of timing spans. Each gunicorn worker keeps its own numbers;
+# Prometheus sums them when scraping several workers.
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60, 120, 300)
+QUANTILES = (0.5, 0.95)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in sorted(labels.items())) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(dict(key))} {value}")
+        return lines
+
+
+class Histogram:
+    # Cumulative buckets for Prometheus, plus a window of recent observations
+    # rendered as a companion summary with p50/p95
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS, window=1000):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.window = window
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "counts": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                    "recent": deque(maxlen=self.window)
+                }
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+            series["recent"].append(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        summary = [
+            f"# HELP {self.name}_recent {self.help_text} (last {self.window} observations)",
+            f"# TYPE {self.name}_recent summary"
+        ]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                labels = dict(key)
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_label_text({**labels, 'le': bound})} {cumulative}")
+                lines.append(f"{self.name}_bucket{_label_text({**labels, 'le': '+Inf'})} {series['count']}")
+                lines.append(f"{self.name}_sum{_label_text(labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{_label_text(labels)} {series['count']}")
+                recent = sorted(series["recent"])
+                for q in QUANTILES:
+                    value = recent[int(q * (len(recent) - 1))] if recent else 0
+                    summary.append(f"{self.name}_recent{_label_text({**labels, 'quantile': q})} {value}")
+        return lines + summary
+
+
+stage_seconds = Histogram("submittal_stage_seconds", "Time spent in each pipeline stage.")
+stage_errors = Counter("submittal_stage_errors_total", "Pipeline stages that raised.")
+jobs_total = Counter("submittal_jobs_total", "Finished check jobs by status.")
+llm_call_seconds = Histogram("submittal_llm_call_seconds", "LLM call latency including retries.")
+llm_calls = Counter("submittal_llm_calls_total", "LLM calls by outcome.")
+llm_retries = Counter("submittal_llm_retries_total", "LLM call retries.")
+llm_tokens = Counter("submittal_llm_tokens_total", "LLM tokens by kind.")
+
+REGISTRY = [stage_seconds, stage_errors, jobs_total, llm_call_seconds, llm_calls, llm_retries, llm_tokens]
+
+
+class Trace:
+    # Timing spans and LLM usage for one request/job. A trace with a parent
+    # (one submittal of a batch) also adds everything to the parent's totals.
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.started = time.time()
+        self.spans = []
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_calls = 0
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def add_span(self, name, start, duration, labels, error=None):
+        span = {"name": name, "start": round(start - self.started, 3), "seconds": round(duration, 3)}
+        span.update(labels)
+        if error:
+            span["error"] = error
+        with self._lock:
+            self.spans.append(span)
+        if self.parent is not None:
+            self.parent.add_span(name, start, duration, labels, error)
+
+    def add_llm_call(self, retries, usage):
+        with self._lock:
+            self.llm_calls += 1
+            self.retries += retries
+            if usage:
+                self.prompt_tokens += usage.get("prompt_tokens", 0)
+                self.completion_tokens += usage.get("completion_tokens", 0)
+        if self.parent is not None:
+            self.parent.add_llm_call(retries, usage)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "spans": sorted(self.spans, key=lambda span: span["start"]),
+                "llm_calls": self.llm_calls,
+                "retries": self.retries,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens
+            }
+
+
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+def current():
+    return _current_trace.get()
+
+
+@contextmanager
+def activate(trace):
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def submit(executor, fn, *args):
+    # executor.submit() that carries the current trace into the worker thread
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+@contextmanager
+def span(name, **labels):
+    start = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        stage_errors.inc(stage=name)
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        stage_seconds.observe(duration, stage=name)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add_span(name, start, duration, labels, error)
+
+
+def record_llm_call(latency, retries, usage=None, failed=False):
+    llm_call_seconds.observe(latency)
+    llm_calls.inc(outcome="error" if failed else "ok")
+    if retries:
+        llm_retries.inc(retries)
+    if usage:
+        llm_tokens.inc(usage.get("prompt_tokens", 0), kind="prompt")
+        llm_tokens.inc(usage.get("completion_tokens", 0), kind="completion")
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_llm_call(retries, usage)
+
+
+def render(gauges=None):
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    # Point-in-time values gathered by the caller, as {name: (help, value)}
+    for name, (help_text, value) in (gauges or {}).items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,180 @@
+import json
+
+import jsonschema
+
+# Incremental parsing of JSON arrays from streamed model output. Elements are
+# yielded as soon as they are complete, code fences and surrounding prose are
+# ignored, and complete elements are salvaged from malformed or truncated output.
+
+COMPARE_ITEM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "requirement": {"type": "string"},
+        "provided": {"type": ["string", "null"]},
+        "compliance": {"type": "boolean"},
+        "comment": {"type": ["string", "null"]}
+    },
+    "required": ["requirement", "compliance"]
+}
+
+REQUIREMENT_SCHEMA = {"type": "string", "minLength": 1}
+
+ARTICLE_REQUIREMENT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "article": {"type": ["string", "null"]},
+        "requirement": {"type": "string", "minLength": 1}
+    },
+    "required": ["requirement"]
+}
+
+# Consumed input is dropped from the buffer once it grows past this many characters
+COMPACT_AT = 8192
+
+
+_validators = {}
+
+
+def _validator(schema):
+    # jsonschema.validate() re-checks the schema on every call, which costs
+    # milliseconds per element; build one validator per schema instead
+    key = json.dumps(schema, sort_keys=True)
+    if key not in _validators:
+        cls = jsonschema.validators.validator_for(schema)
+        cls.check_schema(schema)
+        _validators[key] = cls(schema)
+    return _validators[key]
+
+
+class JSONArrayParser:
+    def __init__(self, schema=None):
+        self.schema = schema
+        self._validator = _validator(schema) if schema is not None else None
+        self.buffer = ""
+        self.pos = 0
+        self.started = False
+        self.finished = False
+        self.skipped = 0
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, text):
+        self.buffer += text
+        return self._validate(self._drain(final=False))
+
+    def close(self):
+        return self._validate(self._drain(final=True))
+
+    def _validate(self, values):
+        valid = []
+        for value in values:
+            if self._validator is not None and not self._validator.is_valid(value):
+                self.skipped += 1
+                continue
+            valid.append(value)
+        return valid
+
+    def _drain(self, final):
+        while not self.finished:
+            if self.pos > COMPACT_AT:
+                self.buffer = self.buffer[self.pos:]
+                self.pos = 0
+            if not self.started:
+                start = self.buffer.find("[", self.pos)
+                if start < 0:
+                    self.pos = len(self.buffer)
+                    return
+                self.started = True
+                self.pos = start + 1
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n,":
+                self.pos += 1
+            if self.pos >= len(self.buffer):
+                return
+            if self.buffer[self.pos] == "]":
+                self.finished = True
+                return
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # Mid-stream the element may just be incomplete; wait for more.
+                # At the end it is malformed or truncated: skip past it to the
+                # next delimiter and keep going.
+                if not final:
+                    return
+                self.skipped += 1
+                end = self._element_end(self.pos)
+                if end < 0:
+                    return
+                self.pos = end
+                if self.buffer[end] == "]":
+                    self.finished = True
+                continue
+            self.pos = end
+            yield value
+
+    def _element_end(self, pos):
+        # Index of the "," or "]" that ends the element starting at pos, or -1
+        # if the input stops first. Brackets and commas inside strings don't count.
+        depth = 0
+        in_string = False
+        escaped = False
+        for i in range(pos, len(self.buffer)):
+            c = self.buffer[i]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif c == "\\":
+                    escaped = True
+                elif c == '"':
+                    in_string = False
+            elif c == '"':
+                in_string = True
+            elif c in "[{":
+                depth += 1
+            elif c in "]}":
+                if depth == 0:
+                    return i
+                depth -= 1
+            elif c == "," and depth == 0:
+                return i
+        return -1
+
+
+def parse_stream(chunks, schema):
+    # Returns (valid items, error). error is whatever interrupted the stream,
+    # or None; items parsed before an interruption are kept.
+    parser = JSONArrayParser(schema)
+    items = []
+    error = None
+    try:
+        for chunk in chunks:
+            items.extend(parser.feed(chunk))
+    except Exception as e:
+        error = e
+    return _finish(parser, items, error)
+
+
+async def aparse_stream(chunks, schema):
+    # parse_stream() for an async iterator of chunks
+    parser = JSONArrayParser(schema)
+    items = []
+    error = None
+    try:
+        async for chunk in chunks:
+            items.extend(parser.feed(chunk))
+    except Exception as e:
+        error = e
+    return _finish(parser, items, error)
+
+
+def _finish(parser, items, error):
+    # Output that stops before the closing "]" (e.g. at the token limit) or
+    # had elements skipped is an error too, so callers don't treat it as complete
+    items.extend(parser.close())
+    if error is None:
+        if not parser.started:
+            error = ValueError("Model did not return a JSON array")
+        elif not parser.finished:
+            error = ValueError("Model output was cut off before the end of the JSON array")
+        elif parser.skipped:
+            error = ValueError(f"Skipped {parser.skipped} malformed or invalid element(s) in model output")
+    return items, error
@@ -0,0 +1,205 @@
+import os
+import json
+import hashlib
+import resource
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import fitz  # PyMuPDF
+
+from cache import DATA_DIR, DiskCache
+import metrics
+
+UPLOAD_DIR = os.path.join(DATA_DIR, "uploads")
+CHUNK_SIZE = 1024 * 1024
+
+# Extracted page text, one JSON string per line, keyed by a hash of the PDF bytes
+text_cache = DiskCache("pages", int(os.getenv("TEXT_CACHE_MAX_MB", "500")) * 1024 * 1024)
+# Text blocks with their vertical position, one JSON list per page, for specs
+layout_cache = DiskCache("layout", int(os.getenv("LAYOUT_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+# Documents with at least PARALLEL_EXTRACT_MIN_PAGES pages are split into
+# page slices and extracted on a process pool; smaller ones stay serial.
+EXTRACT_PROCESSES = int(os.getenv("EXTRACT_PROCESSES", str(os.cpu_count() or 1)))
+PARALLEL_EXTRACT_MIN_PAGES = int(os.getenv("PARALLEL_EXTRACT_MIN_PAGES", "200"))
+EXTRACT_SLICE_PAGES = int(os.getenv("EXTRACT_SLICE_PAGES", "50"))
+
+# How often a running job samples the worker's RSS (see RSSSampler)
+RSS_SAMPLE_SECONDS = float(os.getenv("RSS_SAMPLE_SECONDS", "0.1"))
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: the web process is multi-threaded
+            _process_pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_PROCESSES,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _process_pool
+
+
+def spool_upload(stream):
+    # Copy an upload to a temp file in fixed-size chunks, hashing as we go,
+    # so the PDF never has to sit in memory as one bytes object.
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=".pdf", dir=UPLOAD_DIR)
+    with os.fdopen(fd, "wb") as f:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    return path, digest.hexdigest()
+
+
+def page_content(page, layout=False):
+    if not layout:
+        return page.get_text()
+    # [top, bottom, text] per text block, positions as fractions of page height
+    height = page.rect.height or 1
+    return [
+        [round(y0 / height, 4), round(y1 / height, 4), text]
+        for x0, y0, x1, y1, text, block_no, block_type in page.get_text("blocks", sort=True)
+        if block_type == 0 and text.strip()
+    ]
+
+
+def extract_page_slice(path, start, stop, layout=False):
+    # Runs in a worker process, which opens its own handle on the file
+    with fitz.open(path) as doc:
+        return [page_content(doc[i], layout) for i in range(start, stop)]
+
+
+def iter_extracted_pages(path, layout=False):
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+        if EXTRACT_PROCESSES <= 1 or page_count < PARALLEL_EXTRACT_MIN_PAGES:
+            for page in doc:
+                yield page_content(page, layout)
+            return
+
+    # Keep a bounded window of slices in flight and yield them in page order
+    pool = get_process_pool()
+    starts = iter(range(0, page_count, EXTRACT_SLICE_PAGES))
+    in_flight = deque()
+
+    def submit_next():
+        start = next(starts, None)
+        if start is not None:
+            stop = min(start + EXTRACT_SLICE_PAGES, page_count)
+            in_flight.append(pool.submit(extract_page_slice, path, start, stop, layout))
+
+    for _ in range(EXTRACT_PROCESSES * 2):
+        submit_next()
+    while in_flight:
+        pages = in_flight.popleft().result()
+        submit_next()
+        yield from pages
+
+
+def iter_pages(path, key, layout=False):
+    # Yield page text (or layout blocks) lazily. On a cache hit fitz is never
+    # opened; on a miss pages are written to the cache as they are extracted.
+    cache = layout_cache if layout else text_cache
+    cached = cache.open(key, "r")
+    if cached is not None:
+        with cached:
+            for line in cached:
+                yield json.loads(line)
+        return
+
+    tmp_path = cache.staging_path(key)
+    complete = False
+    try:
+        with open(tmp_path, "w") as out:
+            for content in iter_extracted_pages(path, layout):
+                out.write(json.dumps(content) + "\n")
+                yield content
+        complete = True
+    finally:
+        if complete:
+            cache.commit(key, tmp_path)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def extract_pages(layout=(), **uploads):
+    # Extract several named (path, key) uploads at the same time rather than
+    # back to back; returns {name: [page text, ...]}. Uploads named in layout
+    # get text blocks with positions per page instead.
+    def extract(name, upload):
+        with metrics.span("pdf_extract", document=name):
+            return list(iter_pages(*upload, layout=name in layout))
+
+    with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+        futures = {name: metrics.submit(executor, extract, name, upload) for name, upload in uploads.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def peak_rss_mb():
+    # High-water mark for the whole worker process since it started, shared by
+    # every job it has run. ru_maxrss is reported in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def rss_mb():
+    # Current resident set size, or None where /proc is not available
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RSSSampler:
+    # Samples current RSS on a background thread while a job runs. Other jobs
+    # in the same worker allocate too, so the growth is an upper bound on this
+    # job's own when several run at once.
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.start = None
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        current = rss_mb()
+        if current is not None and (self.peak is None or current > self.peak):
+            self.peak = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self.start = rss_mb()
+        self.peak = self.start
+        if self.start is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+
+    def report(self):
+        if self.start is None:
+            return {"job_rss_peak_mb": None, "job_rss_growth_mb": None}
+        return {
+            "job_rss_peak_mb": round(self.peak, 1),
+            "job_rss_growth_mb": round(self.peak - self.start, 1)
+        }
@@ -0,0 +1,124 @@
+import os
+import time
+import sqlite3
+import threading
+
+from cache import DATA_DIR
+
+# Requests-per-minute and tokens-per-minute buckets shared by every gunicorn
+# worker on the host through one SQLite file. Callers wait for capacity
+# instead of sending requests that would come back as 429s.
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", "500"))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", "30000"))
+RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", os.path.join(DATA_DIR, "ratelimit.db"))
+# Waiters that have not refreshed their row for this long belong to a dead process
+WAITER_STALE_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS waiters (
+    id TEXT PRIMARY KEY,
+    since REAL NOT NULL
+);
+"""
+
+
+class RateLimiter:
+    def __init__(self, rpm=LLM_RPM_LIMIT, tpm=LLM_TPM_LIMIT, path=RATE_LIMIT_DB_PATH):
+        self.limits = {"requests": rpm, "tokens": tpm}
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _try_take(self, conn, cost):
+        # Refill both buckets for the elapsed time and take from them if both
+        # have room. Returns 0 on success, else the seconds until they will.
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = {}
+            for name, limit in self.limits.items():
+                row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                level = limit if row is None else min(limit, row[0] + (now - row[1]) * limit / 60)
+                levels[name] = level
+            # A request bigger than a whole bucket can never fit; let it through
+            # once the bucket is full rather than blocking forever
+            needed = {name: min(cost[name], self.limits[name]) for name in self.limits}
+            wait = max(
+                (needed[name] - levels[name]) * 60 / self.limits[name]
+                for name in self.limits
+            )
+            if wait <= 0:
+                for name in self.limits:
+                    levels[name] -= cost[name]
+            for name, level in levels.items():
+                conn.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (name, level, now)
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return max(wait, 0)
+
+    def acquire(self, tokens):
+        if not all(self.limits.values()):
+            return
+        conn = self._connect()
+        cost = {"requests": 1, "tokens": tokens}
+        wait = self._try_take(conn, cost)
+        if not wait:
+            return
+
+        waiter_id = f"{os.getpid()}-{threading.get_ident()}"
+        started = time.time()
+        try:
+            while wait:
+                conn.execute(
+                    "INSERT OR REPLACE INTO waiters (id, since) VALUES (?, ?)",
+                    (waiter_id, time.time())
+                )
+                time.sleep(min(wait, 5))
+                wait = self._try_take(conn, cost)
+        finally:
+            conn.execute("DELETE FROM waiters WHERE id = ?", (waiter_id,))
+            with self._lock:
+                self.waits += 1
+                self.wait_seconds += time.time() - started
+
+    def queue_depth(self):
+        # Calls currently waiting for capacity, across all worker processes
+        if not all(self.limits.values()):
+            return 0
+        conn = self._connect()
+        conn.execute("DELETE FROM waiters WHERE since < ?", (time.time() - WAITER_STALE_SECONDS,))
+        return conn.execute("SELECT COUNT(*) FROM waiters").fetchone()[0]
+
+    def stats(self):
+        with self._lock:
+            waits = self.waits
+            wait_seconds = self.wait_seconds
+        return {
+            "rpm_limit": self.limits["requests"],
+            "tpm_limit": self.limits["tokens"],
+            "queue_depth": self.queue_depth(),
+            "waits": waits,
+            "wait_seconds": round(wait_seconds, 3)
+        }
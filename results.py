@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import sqlite3
+
+from summary import is_failure, section_of
+
+# Finished checks, kept indefinitely: one row per run (documents, project,
+# totals, timings, token usage and the snapshot a revised submittal is
+# re-checked against) and one row per requirement verdict.
+DATA_DIR = os.getenv("DATA_DIR", "data")
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", os.path.join(DATA_DIR, "results.db"))
+RUNS_PAGE_SIZE = 50
+EXPORT_FETCH_ROWS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    project TEXT,
+    spec_hash TEXT NOT NULL,
+    submittal_hash TEXT,
+    spec_name TEXT,
+    submittal_name TEXT,
+    created REAL NOT NULL,
+    num_extracted INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    compliant INTEGER NOT NULL,
+    noncompliant INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    summary TEXT,
+    seconds REAL,
+    llm_calls INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    trace TEXT,
+    snapshot TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    requirement TEXT NOT NULL,
+    article TEXT,
+    section TEXT,
+    status TEXT NOT NULL,
+    provided TEXT,
+    comment TEXT,
+    pages TEXT,
+    PRIMARY KEY (run_id, position)
+);
+CREATE INDEX IF NOT EXISTS runs_project ON runs (project, created);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created);
+CREATE INDEX IF NOT EXISTS runs_documents ON runs (spec_hash, submittal_hash);
+CREATE INDEX IF NOT EXISTS results_section ON results (section, status);
+CREATE INDEX IF NOT EXISTS results_status ON results (status, run_id);
+"""
+
+RUN_COLUMNS = (
+    "id", "project", "spec_hash", "submittal_hash", "spec_name", "submittal_name", "created",
+    "num_extracted", "total", "compliant", "noncompliant", "failures", "summary",
+    "seconds", "llm_calls", "prompt_tokens", "completion_tokens"
+)
+EXPORT_COLUMNS = (
+    "run_id", "project", "position", "section", "article", "requirement",
+    "status", "provided", "comment", "pages"
+)
+
+
+def _connect():
+    os.makedirs(os.path.dirname(RESULTS_DB_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(RESULTS_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def status_of(item):
+    if is_failure(item):
+        return "failed"
+    return "compliant" if item.get("compliance") is True else "noncompliant"
+
+
+def save_run(run_id, meta, spec_hash, parsed_result, summary, snapshot):
+    totals = summary["totals"]
+    with _connect() as conn:
+        conn.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO runs (id, project, spec_hash, submittal_hash, spec_name, submittal_name, "
+            "created, num_extracted, total, compliant, noncompliant, failures, summary, snapshot) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id, meta.get("project"), spec_hash, meta.get("submittal_hash"),
+                meta.get("spec_name"), meta.get("submittal_name"), time.time(),
+                snapshot["num_extracted"], totals["total"], totals["compliant"], totals["noncompliant"], totals["failures"],
+                summary["text"], json.dumps(snapshot)
+            )
+        )
+        conn.executemany(
+            "INSERT INTO results (run_id, position, requirement, article, section, status, provided, comment, pages) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    run_id, position, str(item.get("requirement", "")), item.get("article"),
+                    section_of(item), status_of(item), item.get("provided"), item.get("comment"),
+                    json.dumps(item.get("pages", []))
+                )
+                for position, item in enumerate(parsed_result)
+            ]
+        )
+
+
+def record_usage(run_id, trace, seconds=None):
+    # Timings and token usage are only known once the whole job has finished;
+    # seconds defaults to the trace's "job" span
+    if seconds is None:
+        job_span = next((span for span in trace["spans"] if span["name"] == "job"), None)
+        seconds = job_span["seconds"] if job_span else None
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE runs SET seconds = ?, llm_calls = ?, prompt_tokens = ?, completion_tokens = ?, trace = ? "
+            "WHERE id = ?",
+            (
+                seconds, trace["llm_calls"],
+                trace["prompt_tokens"], trace["completion_tokens"], json.dumps(trace), run_id
+            )
+        )
+
+
+def get_run(run_id):
+    with _connect() as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(RUN_COLUMNS)}, trace FROM runs WHERE id = ?", (run_id,)
+        ).fetchone()
+    if row is None:
+        return None
+    run = dict(row)
+    run["trace"] = json.loads(run["trace"]) if run["trace"] else None
+    return run
+
+
+def snapshot(run_id):
+    with _connect() as conn:
+        row = conn.execute("SELECT snapshot FROM runs WHERE id = ?", (run_id,)).fetchone()
+    return json.loads(row["snapshot"]) if row and row["snapshot"] else None
+
+
+def list_runs(project=None, before=None, limit=RUNS_PAGE_SIZE):
+    # Newest first, paged by keyset: pass the last id of a page as before to
+    # get the next one. Returns (runs, next cursor or None).
+    where = []
+    params = []
+    if project:
+        where.append("project = ?")
+        params.append(project)
+    if before:
+        where.append("(created, id) < (SELECT created, id FROM runs WHERE id = ?)")
+        params.append(before)
+    query = f"SELECT {', '.join(RUN_COLUMNS)} FROM runs"
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY created DESC, id DESC LIMIT ?"
+    with _connect() as conn:
+        rows = conn.execute(query, (*params, limit + 1)).fetchall()
+    runs = [dict(row) for row in rows[:limit]]
+    return runs, (runs[-1]["id"] if len(rows) > limit else None)
+
+
+def iter_results(run_id=None, project=None, section=None, status=None):
+    # Yields result rows one at a time straight off the cursor, so exports
+    # never hold a whole result set in memory
+    where = []
+    params = []
+    for column, value in (("r.run_id", run_id), ("runs.project", project), ("r.section", section), ("r.status", status)):
+        if value:
+            where.append(f"{column} = ?")
+            params.append(value)
+    query = (
+        "SELECT r.run_id, runs.project, r.position, r.section, r.article, r.requirement, "
+        "r.status, r.provided, r.comment, r.pages "
+        "FROM results r JOIN runs ON runs.id = r.run_id"
+    )
+    if where:
+        query += " WHERE " + " AND ".join(where)
+    query += " ORDER BY runs.created, r.run_id, r.position"
+    conn = _connect()
+    try:
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(EXPORT_FETCH_ROWS)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+    finally:
+        conn.close()
@@ -0,0 +1,132 @@
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+# Submittals are split into page-tagged chunks and indexed with BM25 so each
+# comparison prompt carries only the chunks relevant to its requirements.
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "2000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+# Submittals shorter than this are sent whole; retrieval only pays off on big ones
+FULL_SUBMITTAL_MAX_CHARS = int(os.getenv("FULL_SUBMITTAL_MAX_CHARS", "24000"))
+# Queries are scored together in blocks of about this many (query, chunk) cells
+RETRIEVAL_BLOCK_CELLS = 64 * 1024
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "shall", "that", "the", "this", "to", "with", "all", "each"
+}
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+
+def chunk_pages(pages, max_chars=RETRIEVAL_CHUNK_CHARS):
+    # One chunk per page, with long pages split on paragraph boundaries
+    chunks = []
+    for page_number, text in enumerate(pages, start=1):
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", text):
+            if current and len(current) + len(paragraph) > max_chars:
+                chunks.append({"page": page_number, "text": current.strip()})
+                current = ""
+            current += paragraph + "\n\n"
+        if current.strip():
+            chunks.append({"page": page_number, "text": current.strip()})
+    return chunks
+
+
+class BM25Index:
+    # Postings are stored per term as CSR arrays holding each (term, chunk)
+    # pair's full BM25 weight, so scoring a query is a gather and a bincount
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        counts = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+        self.doc_len = np.array([sum(terms.values()) for terms in counts], dtype=np.float32)
+        self.avg_len = float(self.doc_len.mean()) if len(chunks) else 0
+
+        postings = defaultdict(list)
+        for i, terms in enumerate(counts):
+            for term, tf in terms.items():
+                postings[term].append((i, tf))
+        self.vocab = {term: t for t, term in enumerate(postings)}
+        lengths = np.array([len(docs) for docs in postings.values()], dtype=np.int64)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        pairs = np.array([pair for docs in postings.values() for pair in docs], dtype=np.int64).reshape(-1, 2)
+        self.docs = pairs[:, 0]
+        tf = pairs[:, 1].astype(np.float32)
+        n = len(chunks)
+        idf = np.log(1 + (n - lengths + 0.5) / (lengths + 0.5)).astype(np.float32)
+        norm = 1 - b + b * self.doc_len[self.docs] / (self.avg_len or 1)
+        self.weights = np.repeat(idf, lengths) * tf * (k1 + 1) / (tf + k1 * norm)
+
+    def search(self, query, k=RETRIEVAL_TOP_K):
+        return self.search_many([query], k)[0]
+
+    def search_many(self, queries, k=RETRIEVAL_TOP_K):
+        # Top-k chunk ids per query, best first; chunks that share no term
+        # with the query are never returned
+        n = len(self.chunks)
+        results = []
+        if not n:
+            return [[] for _ in queries]
+        k = min(k, n)
+        block_rows = max(1, RETRIEVAL_BLOCK_CELLS // n)
+        for start in range(0, len(queries), block_rows):
+            block = queries[start:start + block_rows]
+            rows = []
+            terms = []
+            for row, query in enumerate(block):
+                ids = {self.vocab[term] for term in tokenize(query) if term in self.vocab}
+                rows.extend([row] * len(ids))
+                terms.extend(ids)
+            terms = np.array(terms, dtype=np.int64)
+            starts = self.indptr[terms]
+            lengths = self.indptr[terms + 1] - starts
+            # Positions of every posting of every query term, in one array
+            offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+            cells = np.repeat(np.array(rows, dtype=np.int64), lengths) * n + self.docs[offsets]
+            scores = np.bincount(cells, weights=self.weights[offsets], minlength=len(block) * n).reshape(len(block), n)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            ranked = np.lexsort((top, -top_scores), axis=1)
+            top = np.take_along_axis(top, ranked, axis=1)
+            top_scores = np.take_along_axis(top_scores, ranked, axis=1)
+            results.extend(row_top[row_scores > 0].tolist() for row_top, row_scores in zip(top, top_scores))
+        return results
+
+
+class SubmittalIndex:
+    def __init__(self, pages):
+        self.chunks = chunk_pages(pages)
+        self.send_all = sum(len(chunk["text"]) for chunk in self.chunks) <= FULL_SUBMITTAL_MAX_CHARS
+        # Built for small submittals too: evidence_chunks() needs it
+        self.bm25 = BM25Index(self.chunks)
+
+    def relevant_chunks(self, requirements):
+        # Chunk ids to send with each requirement
+        if self.send_all:
+            return [list(range(len(self.chunks))) for _ in requirements]
+        return [sorted(ids) for ids in self.bm25.search_many(requirements)]
+
+    def evidence_chunks(self, requirements):
+        # The chunks each verdict depends on, even when the whole submittal is
+        # sent; used to tell whether a revision can have changed it
+        return [sorted(ids) for ids in self.bm25.search_many(requirements)]
+
+    def pages(self, chunk_ids):
+        return sorted({self.chunks[i]["page"] for i in chunk_ids})
+
+    def excerpt(self, chunk_ids):
+        # Chunks in document order, each labelled with its page for citation
+        if not chunk_ids:
+            return "(No relevant submittal text found.)"
+        return "\n\n".join(
+            f"[Page {self.chunks[i]['page']}]\n{self.chunks[i]['text']}"
+            for i in sorted(set(chunk_ids))
+        )
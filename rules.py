@@ -0,0 +1,231 @@
+import os
+import re
+
+# Deterministic pre-check for requirements that cite standards or unit-bearing
+# values. The submittal is indexed once; a requirement is resolved locally only
+# when every standard and value it names is found on its evidence pages.
+# Anything else (missing facts, ranges, negations, long prose) goes to the model.
+
+# Requirements longer than this are left to the model; they usually carry
+# conditions the rules can't see
+RULES_MAX_WORDS = int(os.getenv("RULES_MAX_WORDS", "40"))
+# Share of the requirement's other terms (the product, the property) that the
+# matching submittal sentence must also mention
+RULES_MIN_TERM_OVERLAP = float(os.getenv("RULES_MIN_TERM_OVERLAP", "0.5"))
+# ...and at least this many of them, when the requirement has that many
+RULES_MIN_SUBJECT_TERMS = int(os.getenv("RULES_MIN_SUBJECT_TERMS", "2"))
+
+STANDARD_RE = re.compile(
+    r"\b(ASTM|UL|ANSI|NFPA|ASHRAE|AWS|AAMA|BHMA|CSA|FM|ISO|SDI|TCNA|NEMA)[\s-]*([A-Z]{0,2})\s?(\d+(?:\.\d+)*(?:[A-Z](?![A-Za-z]))?)"
+)
+
+NUMBER = r"(\d+[\s-]\d+/\d+|\d+/\d+|\d[\d,]*(?:\.\d+)?)"
+WORD_NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4}
+
+# unit -> patterns whose first group is the value, plus a scale into the unit
+VALUE_PATTERNS = {
+    "psi": [(re.compile(NUMBER + r"\s*(?:psi|lbf?/sq\.? ?in)\b", re.I), 1)],
+    "STC": [
+        (re.compile(r"\bSTC\s*(?:rating\s*)?(?:of\s*)?(\d+)\b"), 1),
+        (re.compile(r"\b(\d+)\s*STC\b"), 1)
+    ],
+    "gauge": [(re.compile(r"\b(\d+)\s*-?\s*(?:gauge|gage|ga\b\.?)", re.I), 1)],
+    "hours": [(re.compile(r"\b(\d+(?:\.\d+)?|one|two|three|four)\s*-?\s*(?:hour|hr)s?\b", re.I), 1)],
+    "minutes": [(re.compile(r"\b(\d+)\s*-?\s*(?:minutes?|min\b(?!\.))", re.I), 1)],
+    "inches": [
+        (re.compile(NUMBER + r"\s*-?\s*(?:inch(?:es)?\b|in\.)", re.I), 1),
+        (re.compile(NUMBER + r'\s*"'), 1),
+        (re.compile(r"\b(\d+(?:\.\d+)?)\s*mm\b", re.I), 1 / 25.4)
+    ]
+}
+
+# Designators whose value must appear verbatim ("Type X", "Class 12.5", "Grade NS")
+DESIGNATOR_RE = re.compile(
+    r"\b(type|class|grade|style|kind|category|series|schedule|level)\s+([A-Z0-9][A-Za-z0-9.\-/]*[A-Za-z0-9]|[A-Z0-9])",
+    re.I
+)
+DIGIT_RE = re.compile(r"\d")
+
+AT_LEAST_RE = re.compile(r"(minimum|min\.|at least|not less than|no less than)\W*(?:\w+\W+){0,2}$", re.I)
+AT_MOST_RE = re.compile(r"(maximum|max\.|at most|not more than|no more than|not to exceed|not exceeding)\W*(?:\w+\W+){0,2}$", re.I)
+AT_LEAST_AFTER_RE = re.compile(r"^\W*(?:minimum|min\b|or (?:more|greater|higher|heavier))", re.I)
+AT_MOST_AFTER_RE = re.compile(r"^\W*(?:maximum|max\b|or (?:less|lower|lighter))", re.I)
+WORD_RE = re.compile(r"[a-z]{3,}")
+STOPWORDS = {
+    "the", "and", "for", "with", "shall", "must", "provide", "provides", "comply", "complies",
+    "conform", "conforms", "accordance", "per", "minimum", "maximum", "least", "not", "less",
+    "more", "than", "rated", "rating", "of", "be", "are", "has", "have", "all", "each", "any",
+    "psi", "gauge", "gage", "hour", "hours", "inch", "inches", "stc"
+} | {org.lower() for org in ("ASTM", "ANSI", "NFPA", "ASHRAE", "AAMA", "BHMA", "CSA", "ISO", "SDI", "TCNA", "NEMA")}
+SENTENCE_RE = re.compile(r"(?<=[.;])\s+(?=[A-Z0-9])")
+# Submittal sentences that state a deviation rather than conformance; the
+# rules can only confirm compliance, so these never count as evidence
+NEGATION_RE = re.compile(
+    r"\b(not|cannot|no(?!\.)|none|n/a|except(?:ion|ions|ed)?|deviat\w*|exclud\w*|non-?complian\w*|substitut\w*)\b|n't\b",
+    re.I
+)
+AMBIGUOUS_RE = re.compile(r"\b(between|range|tolerance|shall not|must not|unless|except|where)\b|±|\+/-", re.I)
+
+
+def parse_number(text):
+    text = text.lower().replace(",", "")
+    if text in WORD_NUMBERS:
+        return float(WORD_NUMBERS[text])
+    whole, _, fraction = re.sub(r"[\s-]+", " ", text).rpartition(" ")
+    if "/" in fraction:
+        numerator, denominator = fraction.split("/")
+        value = float(numerator) / float(denominator)
+        return value + (float(whole) if whole else 0)
+    return float(text)
+
+
+def standards_in(text):
+    return {f"{org} {prefix}{number}" for org, prefix, number in STANDARD_RE.findall(text)}
+
+
+def values_in(text):
+    # [(unit, value, start, end)]
+    found = []
+    for unit, patterns in VALUE_PATTERNS.items():
+        for pattern, scale in patterns:
+            for match in pattern.finditer(text):
+                try:
+                    value = parse_number(match.group(1)) * scale
+                except (ValueError, ZeroDivisionError):
+                    continue
+                found.append((unit, value, match.start(), match.end()))
+    return found
+
+
+def designators_in(text):
+    # ({"type x", "class 50", ...}, [(start, end)])
+    found = set()
+    spans = []
+    for match in DESIGNATOR_RE.finditer(text):
+        found.add(f"{match.group(1).lower()} {match.group(2).lower()}")
+        spans.append(match.span())
+    return found, spans
+
+
+def unparsed_numbers(text, spans):
+    # True when a digit falls outside every span the rules understood:
+    # percentages, weights, mils and the like that can't be compared here
+    for match in DIGIT_RE.finditer(text):
+        if not any(start <= match.start() < end for start, end in spans):
+            return True
+    return False
+
+
+def comparator(text, start, end):
+    before = text[max(0, start - 40):start]
+    after = text[end:end + 20]
+    if AT_LEAST_RE.search(before) or AT_LEAST_AFTER_RE.search(after):
+        return ">="
+    if AT_MOST_RE.search(before) or AT_MOST_AFTER_RE.search(after):
+        return "<="
+    return "="
+
+
+def satisfies(unit, op, required, provided):
+    # A heavier gauge is a smaller number, so "minimum 20 gauge" means <= 20
+    if unit == "gauge" and op != "=":
+        op = "<=" if op == ">=" else ">="
+    if op == ">=":
+        return provided >= required - 1e-6
+    if op == "<=":
+        return provided <= required + 1e-6
+    return abs(provided - required) <= 1e-6 * max(1, abs(required))
+
+
+def terms_in(text):
+    return {word.rstrip("s") for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS}
+
+
+def format_value(unit, value):
+    return f"{value:g} {unit}" if unit != "STC" else f"STC {value:g}"
+
+
+class SubmittalFacts:
+    # Standard designations and unit-bearing values in each submittal sentence.
+    # A requirement only matches facts that appear together in one sentence, so
+    # values from unrelated products on the same page can't satisfy it.
+
+    def __init__(self, pages):
+        self.sentences = []
+        self.by_standard = {}
+        self.by_unit = {}
+        for page, text in enumerate(pages, start=1):
+            for sentence in SENTENCE_RE.split(" ".join(text.split())):
+                if NEGATION_RE.search(sentence):
+                    continue
+                standards = standards_in(sentence)
+                values = [(unit, value) for unit, value, _, _ in values_in(sentence)]
+                if not standards and not values:
+                    continue
+                n = len(self.sentences)
+                self.sentences.append((page, terms_in(sentence), values, designators_in(sentence)[0]))
+                for designation in standards:
+                    self.by_standard.setdefault(designation, set()).add(n)
+                for unit, _ in values:
+                    self.by_unit.setdefault(unit, set()).add(n)
+
+    def precheck(self, requirement, pages):
+        # Returns (verdict, pages cited) when one sentence on the given
+        # submittal pages carries every standard and value the requirement
+        # names, else None
+        if len(requirement.split()) > RULES_MAX_WORDS or AMBIGUOUS_RE.search(requirement):
+            return None
+        standards = standards_in(requirement)
+        found_values = values_in(requirement)
+        values = [
+            (unit, required, comparator(requirement, start, end))
+            for unit, required, start, end in found_values
+        ]
+        if not standards and not values:
+            return None
+        # Anything numeric the rules didn't parse (a qualifier, a unit they
+        # don't know) could be what the submittal fails on; leave it to the model
+        designators, designator_spans = designators_in(requirement)
+        spans = (
+            [match.span() for match in STANDARD_RE.finditer(requirement)]
+            + [(start, end) for _, _, start, end in found_values]
+            + designator_spans
+        )
+        if unparsed_numbers(requirement, spans):
+            return None
+        terms = terms_in(requirement)
+        if not terms:
+            # Nothing says which product the standard or value applies to
+            return None
+        min_terms = max(RULES_MIN_TERM_OVERLAP * len(terms), min(RULES_MIN_SUBJECT_TERMS, len(terms)))
+
+        candidates = None
+        for ids in [self.by_standard.get(d, set()) for d in standards] + [self.by_unit.get(v[0], set()) for v in values]:
+            candidates = ids if candidates is None else candidates & ids
+        pages = set(pages)
+        for n in sorted(candidates):
+            page, found_terms, found_values, found_designators = self.sentences[n]
+            if page not in pages or not designators <= found_designators:
+                continue
+            if len(terms & found_terms) < min_terms:
+                continue
+            evidence = [f"{designation} (page {page})" for designation in sorted(standards)]
+            for unit, required, op in values:
+                match = next(
+                    (value for found_unit, value in found_values
+                     if found_unit == unit and satisfies(unit, op, required, value)),
+                    None
+                )
+                if match is None:
+                    break
+                evidence.append(f"{format_value(unit, match)} (page {page})")
+            else:
+                verdict = {
+                    "requirement": requirement,
+                    "provided": "; ".join(evidence),
+                    "compliance": True,
+                    "comment": "Checked locally: every cited standard and value was found in the submittal.",
+                    "rule": True
+                }
+                return verdict, [page]
+        return None
@@ -0,0 +1,115 @@
+import os
+import re
+import zlib
+
+import numpy as np
+
+from retrieval import tokenize
+
+# Near-duplicate collapsing and topical grouping of requirements before they
+# are batched. Requirements become hashed TF-IDF vectors over word unigrams
+# and bigrams; cosine similarities are computed block by block so memory
+# stays bounded for thousands of requirements.
+
+SIMILARITY_FEATURES = int(os.getenv("SIMILARITY_FEATURES", "1024"))
+# Cosine at or above which two requirements are treated as the same check
+DEDUPE_THRESHOLD = float(os.getenv("DEDUPE_THRESHOLD", "0.9"))
+# Cosine at or above which requirements are batched together
+CLUSTER_THRESHOLD = float(os.getenv("CLUSTER_THRESHOLD", "0.5"))
+SIMILARITY_BLOCK_ROWS = 512
+# Neighbours kept per requirement; enough to fill a batch with related ones
+SIMILARITY_NEIGHBOURS = 16
+
+NEGATION_RE = re.compile(r"\b(not|cannot|no|non|none|never|without|except|unless|only|plus)\b|n't\b", re.I)
+DESIGNATOR_RE = re.compile(r"\b(type|class|grade|style|series|kind|category|level|schedule)\s+([a-z0-9][a-z0-9.\-/]*)", re.I)
+
+
+def features(text):
+    tokens = tokenize(text)
+    shingles = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return [zlib.crc32(shingle.encode("utf-8")) % SIMILARITY_FEATURES for shingle in shingles]
+
+
+def vectorize(texts):
+    # Rows are L2-normalised, so a dot product is the cosine similarity
+    rows = []
+    cols = []
+    for i, text in enumerate(texts):
+        ids = features(text)
+        rows.extend([i] * len(ids))
+        cols.extend(ids)
+    counts = np.zeros((len(texts), SIMILARITY_FEATURES), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1)
+
+    present = counts > 0
+    df = present.sum(axis=0)
+    idf = np.log((1 + len(texts)) / (1 + df)).astype(np.float32) + 1
+    matrix = np.where(present, 1 + np.log(np.maximum(counts, 1)), 0).astype(np.float32) * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+def neighbours(matrix, threshold, k=SIMILARITY_NEIGHBOURS):
+    # Up to k most similar other rows per row with cosine >= threshold, as
+    # [(indices, similarities)] with the most similar first
+    found = []
+    k = min(k, len(matrix) - 1)
+    for start in range(0, len(matrix), SIMILARITY_BLOCK_ROWS):
+        block = matrix[start:start + SIMILARITY_BLOCK_ROWS] @ matrix.T
+        block[np.arange(len(block)), np.arange(start, start + len(block))] = -1
+        top = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        sims = np.take_along_axis(block, top, axis=1)
+        ranked = np.argsort(-sims, axis=1)
+        top = np.take_along_axis(top, ranked, axis=1)
+        sims = np.take_along_axis(sims, ranked, axis=1)
+        for row_top, row_sims in zip(top, sims):
+            keep = row_sims >= threshold
+            found.append((row_top[keep].tolist(), row_sims[keep].tolist()))
+    return found
+
+
+def qualifiers_of(text):
+    # Values, standards, sizes, designators ("Type X") and negation or
+    # exception words; requirements that differ in any of these are never
+    # collapsed however similar the wording
+    numbers = {token for token in tokenize(text) if any(c.isdigit() for c in token)}
+    negations = {match.group(0).lower().replace("n't", "not") for match in NEGATION_RE.finditer(text)}
+    designators = {f"{kind.lower()} {value.lower()}" for kind, value in DESIGNATOR_RE.findall(text)}
+    return frozenset(numbers | negations | designators)
+
+
+def group_requirements(texts):
+    # Returns (duplicate_of, order). duplicate_of[i] is the index whose verdict
+    # requirement i shares (i itself for representatives); order lists the
+    # representatives with related ones next to each other.
+    n = len(texts)
+    if n < 2:
+        return list(range(n)), list(range(n))
+    matrix = vectorize(texts)
+    related = neighbours(matrix, min(CLUSTER_THRESHOLD, DEDUPE_THRESHOLD))
+
+    qualifiers = [qualifiers_of(text) for text in texts]
+    duplicate_of = list(range(n))
+    for i in range(n):
+        if duplicate_of[i] != i:
+            continue
+        for j, sim in zip(*related[i]):
+            if sim < DEDUPE_THRESHOLD:
+                break
+            if j > i and duplicate_of[j] == j and qualifiers[i] == qualifiers[j]:
+                duplicate_of[j] = i
+
+    # Greedy clustering: each unplaced representative pulls in its unplaced
+    # related representatives, most similar first
+    order = []
+    placed = set()
+    for i in range(n):
+        if duplicate_of[i] != i or i in placed:
+            continue
+        placed.add(i)
+        order.append(i)
+        for j in related[i][0]:
+            if duplicate_of[j] == j and j not in placed:
+                placed.add(j)
+                order.append(j)
+    return duplicate_of, order
@@ -0,0 +1,108 @@
+import os
+import re
+from collections import Counter
+
+# Structure-aware reading of CSI MasterFormat specs from PyMuPDF text blocks.
+# Repeating page headers/footers are dropped, SECTION / PART / article numbers
+# are tracked, and only the enforceable parts (PART 2 Products, PART 3
+# Execution) are kept, each article tagged with its reference.
+
+# Blocks starting above / ending below these fractions of the page height are
+# header/footer candidates; they are dropped when they repeat across pages
+HEADER_BAND = 0.1
+FOOTER_BAND = 0.9
+REPEAT_SHARE = float(os.getenv("SPEC_REPEAT_SHARE", "0.5"))
+ENFORCEABLE_PARTS = {"2", "3"}
+
+# Headings are whole lines in uppercase: the number, then optionally a title
+# after a separator (-, –, —, :, .) or an all-caps title with none. A wrapped
+# cross-reference such as "Section 09 91 23 - Interior Painting." or
+# "Part 2 of ..." is body text.
+HEADING_TITLE = r"(?:\s*[-–—:.]\s*.*|\s+[A-Z][A-Z0-9 ,&/()'.\-]*)?$"
+SECTION_RE = re.compile(r"^SECTION\s+(\d{2}) ?(\d{2}) ?(\d{2})((?:\.\d{2})?)" + HEADING_TITLE)
+PART_RE = re.compile(r"^PART\s+([1-3])" + HEADING_TITLE)
+ARTICLE_RE = re.compile(r"^([1-3])\.(\d{1,2})(?:\.\d+)*\.?\s+(?=[A-Z])")
+END_RE = re.compile(r"^END OF SECTION\b")
+# Table-of-contents lines: dot leaders running into a page number
+TOC_RE = re.compile(r"\.{4,}\s*\d+\s*$")
+
+
+def signature(text):
+    # Page numbers and dates change from page to page; the rest of a running
+    # header/footer does not
+    return re.sub(r"\d+", "#", " ".join(text.split()).lower())
+
+
+def strip_running_blocks(pages):
+    # pages: [[[top, bottom, text], ...], ...] -> [[text, ...], ...]
+    margin = Counter()
+    for blocks in pages:
+        margin.update({
+            signature(text) for top, bottom, text in blocks
+            if bottom <= HEADER_BAND or top >= FOOTER_BAND
+        })
+    threshold = max(2, REPEAT_SHARE * len(pages))
+    running = {sig for sig, n in margin.items() if n >= threshold}
+    return [
+        [
+            text for top, bottom, text in blocks
+            if not ((bottom <= HEADER_BAND or top >= FOOTER_BAND) and signature(text) in running)
+        ]
+        for blocks in pages
+    ]
+
+
+def parse_spec(pages):
+    # Returns {"text": cleaned spec text, "articles": [{"ref", "section", "text"}]}.
+    # articles is None when no PART headings were found; callers then fall
+    # back to extracting from the whole text.
+    lines = [
+        line.strip()
+        for blocks in strip_running_blocks(pages)
+        for text in blocks
+        for line in text.splitlines()
+        if line.strip() and not TOC_RE.search(line)
+    ]
+
+    section = None
+    part = None
+    found_parts = False
+    articles = []
+    current = None
+    for line in lines:
+        match = SECTION_RE.match(line)
+        if match:
+            section = " ".join(match.groups()[:3]) + match.group(4)
+            part = None
+            current = None
+            continue
+        match = PART_RE.match(line)
+        if match:
+            part = match.group(1)
+            found_parts = True
+            current = None
+            continue
+        if END_RE.match(line):
+            part = None
+            current = None
+            continue
+        if part not in ENFORCEABLE_PARTS:
+            continue
+        match = ARTICLE_RE.match(line)
+        article = f"{match.group(1)}.{match.group(2)}" if match and match.group(1) == part else None
+        if article is None and current is None:
+            # Text between the PART heading and its first article
+            article = part
+        if article is not None and (current is None or current["article"] != article):
+            ref = f"{section} {article}" if section else article
+            current = {"ref": ref, "section": section, "article": article, "lines": []}
+            articles.append(current)
+        current["lines"].append(line)
+
+    return {
+        "text": "\n".join(lines),
+        "articles": [
+            {"ref": a["ref"], "section": a["section"], "text": "\n".join(a["lines"])}
+            for a in articles
+        ] if found_parts else None
+    }
@@ -0,0 +1,70 @@
+import re
+from collections import OrderedDict
+
+CSI_SECTION_RE = re.compile(r"\b\d{2} \d{2} \d{2}(?:\.\d{2})?\b")
+
+
+def is_failure(item):
+    # Rows produced by the error fallback in check_batch, not a real verdict
+    return item.get("error") is True
+
+
+def section_of(item):
+    if item.get("section"):
+        return item["section"]
+    # The spec article a requirement came from names its section
+    for field in ("article", "requirement"):
+        match = CSI_SECTION_RE.search(str(item.get(field, "")))
+        if match:
+            return match.group(0)
+    return "General"
+
+
+def count(items):
+    failures = sum(1 for item in items if is_failure(item))
+    compliant = sum(1 for item in items if item.get("compliance") is True and not is_failure(item))
+    return {
+        "total": len(items),
+        "compliant": compliant,
+        "noncompliant": len(items) - compliant - failures,
+        "failures": failures
+    }
+
+
+def plural(n, word):
+    return f"{n} {word}" if n == 1 else f"{n} {word}s"
+
+
+def build_summary(parsed_result, num_extracted=None):
+    totals = count(parsed_result)
+
+    grouped = OrderedDict()
+    for item in parsed_result:
+        grouped.setdefault(section_of(item), []).append(item)
+    sections = [dict(section=name, **count(items)) for name, items in grouped.items()]
+
+    if not totals["total"]:
+        text = "No enforceable requirements were found in the specification."
+    else:
+        verb = "is" if totals["compliant"] == 1 else "are"
+        text = f"{totals['compliant']} of {plural(totals['total'], 'requirement')} {verb} compliant"
+        parts = []
+        if totals["noncompliant"]:
+            parts.append(f"{totals['noncompliant']} non-compliant")
+        if totals["failures"]:
+            parts.append(f"{totals['failures']} could not be checked")
+        text += (", " + " and ".join(parts) if parts else "") + "."
+        if num_extracted and num_extracted > totals["total"]:
+            text += f" {num_extracted - totals['total']} extracted requirements were not checked."
+
+        worst = [
+            section for section in sections
+            if section["noncompliant"] and section["section"] != "General"
+        ]
+        worst.sort(key=lambda section: section["noncompliant"], reverse=True)
+        if worst:
+            text += " Most non-compliances: " + ", ".join(
+                f"{section['section']} ({section['noncompliant']})" for section in worst[:3]
+            ) + "."
+
+    return {"text": text, "totals": totals, "sections": sections}
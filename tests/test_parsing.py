@@ -0,0 +1,77 @@
+import asyncio
+
+from parsing import JSONArrayParser, parse_stream, aparse_stream, REQUIREMENT_SCHEMA, COMPARE_ITEM_SCHEMA
+
+
+def chunked(text, size=5):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def test_complete_array_across_chunks():
+    items, error = parse_stream(chunked('```json\n["a", "b", "c"]\n```'), REQUIREMENT_SCHEMA)
+    assert items == ["a", "b", "c"]
+    assert error is None
+
+
+def test_truncated_output_is_an_error():
+    items, error = parse_stream(chunked('["Studs shall be 20 gauge.", "Board shall be 5/8 in'), REQUIREMENT_SCHEMA)
+    assert items == ["Studs shall be 20 gauge."]
+    assert "cut off" in str(error)
+
+
+def test_truncated_between_elements_is_an_error():
+    items, error = parse_stream(['["a", "b",'], REQUIREMENT_SCHEMA)
+    assert items == ["a", "b"]
+    assert error is not None
+
+
+def test_malformed_string_is_skipped_whole():
+    items, error = parse_stream(['["a\\x", "b"]'], REQUIREMENT_SCHEMA)
+    assert items == ["b"]
+    assert "Skipped 1" in str(error)
+
+
+def test_malformed_string_containing_delimiters():
+    items, error = parse_stream(['["bad \\q, [x]", "ok", "also ok"]'], REQUIREMENT_SCHEMA)
+    assert items == ["ok", "also ok"]
+    assert error is not None
+
+
+def test_malformed_object_is_skipped_whole():
+    text = (
+        '[{"requirement": "a", "compliance": true "comment": {"x": 1}}, '
+        '{"requirement": "b", "compliance": false}]'
+    )
+    items, error = parse_stream([text], COMPARE_ITEM_SCHEMA)
+    assert items == [{"requirement": "b", "compliance": False}]
+    assert error is not None
+
+
+def test_last_element_malformed_closes_array():
+    parser = JSONArrayParser(REQUIREMENT_SCHEMA)
+    assert parser.feed('["a", "b\\x"]') == ["a"]
+    assert parser.close() == []
+    assert parser.finished
+    assert parser.skipped == 1
+
+
+def test_schema_invalid_elements_are_reported():
+    items, error = parse_stream(['["a", 3, ""]'], REQUIREMENT_SCHEMA)
+    assert items == ["a"]
+    assert "Skipped 2" in str(error)
+
+
+def test_no_array():
+    items, error = parse_stream(["I could not find any requirements."], REQUIREMENT_SCHEMA)
+    assert items == []
+    assert "did not return a JSON array" in str(error)
+
+
+def test_async_matches_sync():
+    async def chunks():
+        for chunk in chunked('["a", "b'):
+            yield chunk
+
+    items, error = asyncio.run(aparse_stream(chunks(), REQUIREMENT_SCHEMA))
+    assert items == ["a"]
+    assert "cut off" in str(error)
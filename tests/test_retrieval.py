@@ -0,0 +1,45 @@
+import math
+from collections import Counter
+
+from retrieval import BM25Index, SubmittalIndex, tokenize
+
+PAGES = [
+    "Gypsum board complies with ASTM C1396, Type X, 5/8 inch.",
+    "Steel studs are 20 gauge and comply with ASTM C645.",
+    "Joint sealant complies with ASTM C920, Type S, Grade NS.",
+    "Gypsum board fasteners are Type S screws.",
+    "Warranty: one year."
+]
+
+
+def reference_scores(chunks, query, k1=1.5, b=0.75):
+    counts = [Counter(tokenize(chunk["text"])) for chunk in chunks]
+    avg_len = sum(sum(c.values()) for c in counts) / len(counts)
+    df = Counter(term for c in counts for term in c)
+    scores = {}
+    for i, c in enumerate(counts):
+        for term in set(tokenize(query)) & set(c):
+            idf = math.log(1 + (len(counts) - df[term] + 0.5) / (df[term] + 0.5))
+            norm = 1 - b + b * sum(c.values()) / avg_len
+            scores[i] = scores.get(i, 0) + idf * c[term] * (k1 + 1) / (c[term] + k1 * norm)
+    return scores
+
+
+def test_search_matches_reference_ranking():
+    chunks = [{"page": n, "text": text} for n, text in enumerate(PAGES, start=1)]
+    index = BM25Index(chunks)
+    queries = ["Gypsum board shall be Type X.", "Studs shall comply with ASTM C645.", "Paint shall be low VOC."]
+    for query, found in zip(queries, index.search_many(queries, k=3)):
+        scores = reference_scores(chunks, query)
+        expected = sorted(scores, key=lambda i: -scores[i])[:3]
+        assert found == expected
+        assert index.search(query, k=3) == found
+    assert index.search_many(queries, k=3)[2] == []
+
+
+def test_empty_submittal_and_send_all():
+    assert BM25Index([]).search_many(["Gypsum board"]) == [[]]
+    index = SubmittalIndex(PAGES)
+    assert index.send_all
+    assert index.relevant_chunks(["Gypsum board", "Studs"]) == [[0, 1, 2, 3, 4]] * 2
+    assert index.evidence_chunks(["Steel studs shall be 20 gauge."])[0][0] == 1
@@ -0,0 +1,90 @@
+from rules import SubmittalFacts
+
+
+def precheck(requirement, *sentences):
+    facts = SubmittalFacts(list(sentences))
+    return facts.precheck(requirement, range(1, len(sentences) + 1))
+
+
+def test_matching_sentence_resolves_compliant():
+    result = precheck("Joint sealant shall comply with ASTM C920.", "Joint sealant complies with ASTM C920, Type S, Grade NS.")
+    assert result is not None
+    verdict, pages = result
+    assert verdict["compliance"] is True
+    assert pages == [1]
+
+
+def test_negated_submittal_sentence_is_not_evidence():
+    assert precheck("Sealant shall comply with ASTM C920.", "Sealant does not comply with ASTM C920.") is None
+    assert precheck("Sealant shall comply with ASTM C920.", "Sealant doesn't comply with ASTM C920.") is None
+    assert precheck("Steel studs shall be minimum 20 gauge.", "Steel studs: 20 gauge not available, 22 gauge substituted.") is None
+
+
+def test_deviation_and_exception_sentences_are_not_evidence():
+    assert precheck("Sealant shall comply with ASTM C920.", "Deviation: sealant tested to ASTM C920 Type M.") is None
+    assert precheck("Sealant shall comply with ASTM C920.", "Sealant complies with ASTM C920 except for color range.") is None
+    assert precheck("Sealant shall comply with ASTM C920.", "Sealant ASTM C920 compliance: N/A.") is None
+
+
+def test_negation_elsewhere_on_the_page_does_not_block():
+    result = precheck(
+        "Sealant shall comply with ASTM C920.",
+        "Primer is not required. Sealant complies with ASTM C920."
+    )
+    assert result is not None
+
+
+def test_value_must_be_satisfied():
+    assert precheck("Steel studs shall be minimum 20 gauge.", "Steel studs are 25 gauge.") is None
+    assert precheck("Steel studs shall be minimum 20 gauge.", "Steel studs are 18 gauge.") is not None
+
+
+def test_subject_must_match():
+    assert precheck("Steel studs shall be minimum 20 gauge.", "Steel track is 20 gauge.") is None
+    assert precheck("Gypsum board shall be 5/8 inch.", "Gypsum board is 5/8 in. thick.") is not None
+    assert precheck("Gypsum board shall be 5/8 inch.", "Acoustic board is 5/8 in. thick.") is None
+
+
+def test_requirement_without_subject_goes_to_model():
+    assert precheck("Comply with ASTM C920.", "Sealant complies with ASTM C920.") is None
+
+
+def test_designators_must_match_exactly():
+    assert precheck(
+        "Gypsum board shall be Type X complying with ASTM C1396.",
+        "Regular gypsum board complying with ASTM C1396."
+    ) is None
+    assert precheck(
+        "Gypsum board shall be Type X complying with ASTM C1396.",
+        "Gypsum board, Type X, complying with ASTM C1396."
+    ) is not None
+    assert precheck(
+        "Joint sealant shall comply with ASTM C920, Class 50.",
+        "Joint sealant complies with ASTM C920, Class 12.5."
+    ) is None
+    assert precheck(
+        "Joint sealant shall comply with ASTM C920, Class 50.",
+        "Joint sealant complies with ASTM C920, Type S, Class 50."
+    ) is not None
+
+
+def test_fire_rating_minutes_are_compared():
+    assert precheck(
+        "Fire doors shall be 90 minute rated per UL 10C.",
+        "Fire doors are 20 minute rated per UL 10C."
+    ) is None
+    assert precheck(
+        "Fire doors shall be 90 minute rated per UL 10C.",
+        "Fire doors are 90 minute rated per UL 10C."
+    ) is not None
+
+
+def test_unparsed_numbers_go_to_model():
+    assert precheck(
+        "Steel studs shall be 20 gauge with 50 ksi yield strength.",
+        "Steel studs are 20 gauge with 33 ksi yield strength."
+    ) is None
+    assert precheck(
+        "Sealant shall comply with ASTM C920 with 25 percent movement capability.",
+        "Sealant complies with ASTM C920 with 12 percent movement capability."
+    ) is None
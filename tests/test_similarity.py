@@ -0,0 +1,34 @@
+from similarity import DEDUPE_THRESHOLD, group_requirements, vectorize
+
+OTHERS = [
+    "Sealant shall comply with ASTM C920.",
+    "Paint shall be low VOC.",
+    "Ceiling tiles shall be mineral fiber.",
+    "Doors shall be flush wood."
+]
+BASE = (
+    "Install joint sealant at exterior perimeter joints around doors, windows, louvers and wall "
+    "penetrations, tooled concave, per the manufacturer's written instructions{}."
+)
+
+
+def test_rewordings_collapse():
+    duplicate_of, _ = group_requirements([BASE.format(""), BASE.format("").upper()] + OTHERS)
+    assert duplicate_of[:2] == [0, 0]
+
+
+def test_negation_and_qualifiers_keep_requirements_apart():
+    for a, b in (
+        (BASE.format(""), BASE.format("").replace("Install", "Do not install")),
+        (BASE.format(""), BASE.format(" except at expansion joints")),
+        (BASE.format(""), BASE.format(" unless noted")),
+        (BASE.format(""), BASE.format(" only")),
+        (BASE.format(", Type S"), BASE.format(", Type M")),
+        (BASE.format(", Class A"), BASE.format(", Class B"))
+    ):
+        texts = [a, b] + OTHERS
+        matrix = vectorize(texts)
+        # Close enough that wording alone would collapse them
+        assert matrix[0] @ matrix[1] >= DEDUPE_THRESHOLD, (a, b)
+        duplicate_of, _ = group_requirements(texts)
+        assert duplicate_of[:2] == [0, 1], (a, b)
@@ -0,0 +1,89 @@
+from specparse import parse_spec
+
+
+def page(*lines):
+    # One body block in the middle of the page, clear of the header/footer bands
+    return [[0.2, 0.8, "\n".join(lines)]]
+
+
+def test_wrapped_cross_references_are_not_headings():
+    spec = parse_spec([page(
+        "SECTION 09 21 16 - GYPSUM BOARD ASSEMBLIES",
+        "PART 2 - PRODUCTS",
+        "2.1 BOARD",
+        "A. Board shall be Type X, as described in",
+        "Part 2 of Section 09 29 00.",
+        "PART 3 - EXECUTION",
+        "3.1 INSTALLATION",
+        "A. Paint exposed board as specified in",
+        "Section 09 91 23 - Interior Painting.",
+        "B. Fasten board at 12 inches on center.",
+        "3.2 CLEANING",
+        "A. Remove debris daily.",
+        "END OF SECTION 09 21 16"
+    )])
+    articles = {article["ref"]: article["text"] for article in spec["articles"]}
+    assert list(articles) == ["09 21 16 2.1", "09 21 16 3.1", "09 21 16 3.2"]
+    assert "Part 2 of Section 09 29 00." in articles["09 21 16 2.1"]
+    assert "Section 09 91 23 - Interior Painting." in articles["09 21 16 3.1"]
+    assert "B. Fasten board at 12 inches on center." in articles["09 21 16 3.1"]
+
+
+def test_headings_without_titles():
+    spec = parse_spec([page(
+        "SECTION 092116",
+        "PART 1",
+        "1.1 SUMMARY",
+        "A. Submit product data.",
+        "PART 2",
+        "2.1 STUDS",
+        "A. Studs shall be 20 gauge."
+    )])
+    assert [article["ref"] for article in spec["articles"]] == ["09 21 16 2.1"]
+
+
+def test_no_part_headings_falls_back_to_text():
+    spec = parse_spec([page("Studs shall be 20 gauge.", "Part 2 of the work follows.")])
+    assert spec["articles"] is None
+    assert "Studs shall be 20 gauge." in spec["text"]
+
+
+def refs(*lines):
+    return [article["ref"] for article in parse_spec([page(*lines)])["articles"] or []]
+
+
+def test_heading_separators_and_untitled_forms():
+    body = ["2.1 BOARD", "A. Board shall be Type X.", "3.1 INSTALLATION", "A. Fasten at 12 inches."]
+    for section, part_2, part_3 in (
+        ("SECTION 09 21 16 GYPSUM BOARD", "PART 2 PRODUCTS", "PART 3 EXECUTION"),
+        ("SECTION 09 21 16 — GYPSUM BOARD", "PART 2 — PRODUCTS", "PART 3 — EXECUTION"),
+        ("SECTION 09 21 16: GYPSUM BOARD", "PART 2. PRODUCTS", "PART 3: EXECUTION"),
+        ("SECTION 09 21 16 – GYPSUM BOARD", "PART 2 – PRODUCTS", "PART 3 – EXECUTION"),
+    ):
+        assert refs(section, part_2, body[0], body[1], part_3, body[2], body[3]) == ["09 21 16 2.1", "09 21 16 3.1"]
+
+
+def test_mixed_heading_styles_keep_every_part():
+    assert refs(
+        "SECTION 09 21 16 - GYPSUM BOARD",
+        "PART 1 - GENERAL",
+        "1.1 SUMMARY",
+        "A. Submit product data.",
+        "PART 2 PRODUCTS",
+        "2.1 BOARD",
+        "A. Board shall be Type X.",
+        "PART 3 — EXECUTION",
+        "3.1 INSTALLATION",
+        "A. Fasten at 12 inches."
+    ) == ["09 21 16 2.1", "09 21 16 3.1"]
+
+
+def test_uppercase_lead_with_lowercase_text_is_not_a_heading():
+    assert refs(
+        "SECTION 09 21 16",
+        "PART 2",
+        "2.1 BOARD",
+        "A. Board shall match the board in",
+        "PART 2 of the referenced section.",
+        "B. Edges shall be tapered."
+    ) == ["09 21 16 2.1"]
@@ -0,0 +1,20 @@
+from summary import count, is_failure
+
+
+def test_failures_are_flagged_not_inferred_from_comment():
+    verdict = {
+        "requirement": "Sealant shall comply with ASTM C920.",
+        "provided": "",
+        "compliance": False,
+        "comment": "Error: the submittal omits the sealant data sheet."
+    }
+    failed = {
+        "requirement": "Studs shall be 20 gauge.",
+        "provided": "",
+        "compliance": False,
+        "comment": "Error: Timeout",
+        "error": True
+    }
+    assert not is_failure(verdict)
+    assert is_failure(failed)
+    assert count([verdict, failed]) == {"total": 2, "compliant": 0, "noncompliant": 1, "failures": 1}
@@ -0,0 +1,55 @@
+import re
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken is optional; fall back to the ~4 characters per token rule of thumb
+    _encoding = None
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def _split_long_line(line, budget):
+    # Hard-wrap a single line that is over budget on its own
+    step = max(1, len(line) * budget // max(count_tokens(line), 1))
+    return [line[i:i + step] for i in range(0, len(line), step)]
+
+
+def split_text(text, budget, overlap=0):
+    # Split text on line boundaries into sections of at most ~budget tokens.
+    # Each section repeats roughly `overlap` tokens from the end of the
+    # previous one so requirements straddling a boundary are not cut in half.
+    lines = []
+    for line in re.split(r"(?<=\n)", text):
+        if count_tokens(line) > budget:
+            lines.extend(_split_long_line(line, budget))
+        elif line:
+            lines.append(line)
+
+    sections = []
+    current = []
+    used = 0
+    for line in lines:
+        cost = count_tokens(line)
+        if current and used + cost > budget:
+            sections.append("".join(current))
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(current):
+                previous_cost = count_tokens(previous)
+                if carried_tokens + previous_cost > overlap:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous_cost
+            current = carried
+            used = carried_tokens
+        current.append(line)
+        used += cost
+    if current:
+        sections.append("".join(current))
+    return sections